@@ -7,8 +7,12 @@ import io
 from services.user_activity_service import UserActivityService
 from models.user_activity_model import ActiveUsersResult
 from models.format_enum import FormatEnum
-from utils.formatters import format_data_response
+from utils.formatters import format_data_response, format_stream_response
+from utils.pagination import page_after, page_by_date, with_next_cursor
+from core.config import settings
 from core.auth import verify_api_key
+from core.database import get_engine
+from sqlalchemy.ext.asyncio import AsyncEngine
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -16,26 +20,44 @@ logger = logging.getLogger(__name__)
 @router.get("/user-activity", response_model=List[ActiveUsersResult])
 async def get_user_activity(
     query_name: str = Query(..., description="Имя SQL-скрипта без расширения"),
-    format: FormatEnum = Query(FormatEnum.json, description="Response format: json or csv"),
+    format: FormatEnum = Query(FormatEnum.json, description="Response format: json, csv or ndjson"),
     date_from: Optional[str] = Query(None, description="Start date (YYYY-MM-DD) for filtering"),
     date_to: Optional[str] = Query(None, description="End date (YYYY-MM-DD) for filtering"),
-    _: None = Depends(verify_api_key)
+    incremental: Optional[bool] = Query(None, description="Reuse stored per-day results and query only missing/recent days (requires date_from and date_to; default REPORT_INCREMENTAL)"),
+    stream: bool = Query(False, description="Read rows with a server-side cursor and stream the response in batches (no result cache)"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE, description="Page size; rows are ordered by date, the next page cursor is returned in the X-Next-Cursor header"),
+    cursor: Optional[str] = Query(None, description="Cursor of the next page from the X-Next-Cursor header of the previous response"),
+    _: None = Depends(verify_api_key),
+    engine: AsyncEngine = Depends(get_engine)
 ):
     """
     Получить данные о ежедневной активности пользователей.
+    limit/cursor: постраничная выдача по ключу (дата, порядковый номер строки за дату); несовместима со stream.
     """
+    filters = {"query_name": query_name, "date_from": date_from, "date_to": date_to}
+    after = page_after(limit, cursor, stream, (str, int), filters)
     try:
-        service = UserActivityService()
-        results = await service.get_active_users(
-            query_name,
-            date_from,
-            date_to
-        )
-        return format_data_response(
+        if stream:
+            chunks = UserActivityService(engine=engine).stream_active_users(query_name, date_from, date_to)
+            return format_stream_response(chunks, format, f"{query_name}.csv")
+        async with UserActivityService(engine=engine) as service:
+            results = await service.get_active_users(
+                query_name,
+                date_from,
+                date_to,
+                incremental=incremental
+            )
+        next_cursor = None
+        if limit is not None:
+            results, next_cursor = page_by_date(results, limit, after, filters)
+        return with_next_cursor(format_data_response(
             data=results,
             fmt=format,
             filename=f"{query_name}.csv"
-        )
+        ), next_cursor)
+    except FileNotFoundError as e:
+        logger.warning(f"{e}")
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting user activity data: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -0,0 +1,144 @@
+"""
+Service endpoints for monitoring and maintenance.
+Служебные эндпоинты для мониторинга и обслуживания.
+"""
+
+import os
+from datetime import date
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+import logging
+
+from utils.currency import CurrencyConverter
+from utils.currency.constants import Currency
+from utils.currency.memory_cache import rate_memory_cache
+from utils.csv_cache import csv_cache
+from utils.cache_events import cache_events
+from utils.category_mapper import category_mapper
+from utils.report_cache import report_cache
+from utils.report_store import report_store
+from core.auth import verify_api_key
+from core.database import pool_stats
+from core.executor import payment_executor
+
+router = APIRouter(prefix="/admin")
+logger = logging.getLogger(__name__)
+
+MAX_PREFETCH_DAYS = 366
+
+# Кэши и пулы в памяти у каждого воркера свои: статистика относится к воркеру pid,
+# обработавшему запрос, а сбросы рассылаются всем воркерам через cache_events
+def _worker_stats(stats: dict) -> dict:
+    return {"pid": os.getpid(), **stats}
+
+@router.get("/rate-cache")
+async def get_rate_cache_stats(_: None = Depends(verify_api_key)) -> dict:
+    """
+    Статистика кэша курсов валют в памяти воркера (размер, попадания, промахи).
+    """
+    return _worker_stats(rate_memory_cache.stats())
+
+@router.get("/csv-cache")
+async def get_csv_cache_stats(_: None = Depends(verify_api_key)) -> dict:
+    """
+    Статистика кэша разобранных CSV-файлов (число файлов, занятая память, попадания, промахи).
+    """
+    return _worker_stats(csv_cache.stats())
+
+@router.get("/report-cache")
+async def get_report_cache_stats(_: None = Depends(verify_api_key)) -> dict:
+    """
+    Статистика кэша результатов отчетов (размер, попадания, устаревшие попадания, промахи).
+    """
+    return _worker_stats(report_cache.stats())
+
+@router.post("/report-cache/invalidate")
+async def invalidate_report_cache(
+    kind: Optional[str] = Query(None, description="Report kind: financial or activity (all if not set)"),
+    query_name: Optional[str] = Query(None, description="Query name (all if not set)"),
+    _: None = Depends(verify_api_key)
+) -> Dict[str, int]:
+    """
+    Сбросить закэшированные результаты отчетов во всех воркерах.
+    invalidated — число результатов, сброшенных в воркере, обработавшем запрос;
+    остальные воркеры сбрасывают кэш в течение CACHE_EVENTS_CHECK_INTERVAL.
+    """
+    return _worker_stats({"invalidated": cache_events.publish("report_cache", kind=kind, query_name=query_name)})
+
+@router.post("/report-store/invalidate")
+async def invalidate_report_store(
+    kind: Optional[str] = Query(None, description="Report kind: financial or activity (all if not set)"),
+    query_name: Optional[str] = Query(None, description="Query name (all if not set)"),
+    _: None = Depends(verify_api_key)
+) -> Dict[str, int]:
+    """
+    Удалить сохраненные результаты отчетов по дням (будут пересчитаны при следующем запросе).
+    """
+    return {"invalidated_days": report_store.invalidate(kind, query_name)}
+
+@router.get("/db-pool")
+async def get_db_pool_stats(request: Request, _: None = Depends(verify_api_key)) -> dict:
+    """
+    Состояние пула соединений к БД (размер, занятые и свободные соединения, overflow).
+    """
+    return _worker_stats(pool_stats(getattr(request.app.state, "engine", None)))
+
+@router.get("/executor")
+async def get_executor_stats(_: None = Depends(verify_api_key)) -> dict:
+    """
+    Состояние пула обработки платежей (воркеры, задачи в работе и в очереди, отклоненные).
+    """
+    return _worker_stats(payment_executor.stats())
+
+def _mapping_info() -> dict:
+    current = category_mapper.current_version
+    return {
+        "pid": os.getpid(),
+        "version": current.version,
+        "checksum": current.checksum,
+        "articles": len(current.mapping),
+        "pairs": len(current.lookup),
+        "loaded_at": current.loaded_at,
+    }
+
+@router.get("/category-mapping")
+async def get_category_mapping_version(_: None = Depends(verify_api_key)) -> dict:
+    """
+    Активная версия маппинга категорий.
+    """
+    return _mapping_info()
+
+@router.post("/category-mapping/reload")
+async def reload_category_mapping(_: None = Depends(verify_api_key)) -> dict:
+    """
+    Перечитать файл маппинга категорий во всех воркерах. При ошибке остается активной текущая версия.
+    """
+    if not cache_events.publish("category_mapping"):
+        raise HTTPException(status_code=500, detail="Failed to reload category mapping, previous version kept")
+    return _mapping_info()
+
+@router.get("/cache-events")
+async def get_cache_events_state(_: None = Depends(verify_api_key)) -> dict:
+    """
+    Последнее примененное воркером событие сброса кэшей.
+    """
+    return _worker_stats(cache_events.stats())
+
+@router.post("/rates/prefetch")
+async def prefetch_rates(
+    date_from: date = Query(..., description="Start date (YYYY-MM-DD) of the range to prefetch"),
+    date_to: date = Query(..., description="End date (YYYY-MM-DD) of the range to prefetch"),
+    bases: List[Currency] = Query([Currency.USD], description="Base currencies to prefetch"),
+    _: None = Depends(verify_api_key)
+) -> Dict[str, int]:
+    """
+    Загрузить недостающие курсы валют за диапазон дат в кэш (параллельно, с ограничением числа запросов).
+    """
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    if (date_to - date_from).days >= MAX_PREFETCH_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {MAX_PREFETCH_DAYS} days")
+
+    fetched = await CurrencyConverter().aprefetch_rates(bases, date_from, date_to)
+    logger.info(f"Prefetched {fetched} rate tables for {[b.value for b in bases]} from {date_from} to {date_to}")
+    return {"fetched": fetched}
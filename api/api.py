@@ -8,8 +8,12 @@ from fastapi import APIRouter
 from api import payments
 from api import financial
 from api import activities
+from api import queries
+from api import admin
 
 api_router = APIRouter()
 api_router.include_router(payments.router, tags=["payments"])
 api_router.include_router(financial.router, tags=["db-queries"])
-api_router.include_router(activities.router, tags=["db-queries"])
\ No newline at end of file
+api_router.include_router(activities.router, tags=["db-queries"])
+api_router.include_router(queries.router, tags=["db-queries"])
+api_router.include_router(admin.router, tags=["admin"])
\ No newline at end of file
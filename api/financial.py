@@ -1,43 +1,92 @@
 from fastapi import APIRouter, Query, HTTPException, Depends
+import time
 import logging
 from typing import Optional
 from fastapi.responses import StreamingResponse
 import io
 
 from services.financial_stats_service import FinancialStatsService
-from models.financial_stats_model import FinancialStatsResult
+from models.financial_stats_model import FinancialStatsResult, FinancialStatsBatchRequest, FinancialStatsBatchResponse
 from models.format_enum import FormatEnum
 from utils.currency.constants import Currency
-from utils.formatters import format_data_response
+from utils.formatters import format_data_response, format_stream_response
+from utils.pagination import page_after, page_by_date, with_next_cursor
+from core.config import settings
 from core.auth import verify_api_key
+from core.database import get_engine
+from sqlalchemy.ext.asyncio import AsyncEngine
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+MAX_BATCH_QUERIES = 20
+
 @router.get("/financial-stats", response_model=list[FinancialStatsResult])
 async def external_query(
     query_name: str = Query(..., description="Имя SQL-скрипта без расширения"),
-    format: FormatEnum = Query(FormatEnum.json, description="Response format: json or csv"),
+    format: FormatEnum = Query(FormatEnum.json, description="Response format: json, csv or ndjson"),
     currency: Currency = Query(Currency.USD, description="Currency for output amounts"),
     date_from: Optional[str] = Query(None, description="Start date (YYYY-MM-DD) for filtering"),
     date_to: Optional[str] = Query(None, description="End date (YYYY-MM-DD) for filtering"),
-    _: None = Depends(verify_api_key)
+    incremental: Optional[bool] = Query(None, description="Reuse stored per-day results and query only missing/recent days (requires date_from and date_to; default REPORT_INCREMENTAL)"),
+    stream: bool = Query(False, description="Read rows with a server-side cursor and stream the response in batches (no result cache)"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE, description="Page size; rows are ordered by date, the next page cursor is returned in the X-Next-Cursor header"),
+    cursor: Optional[str] = Query(None, description="Cursor of the next page from the X-Next-Cursor header of the previous response"),
+    _: None = Depends(verify_api_key),
+    engine: AsyncEngine = Depends(get_engine)
 ):
     """
     Выполнить SQL-скрипт из папки SQL_DIR по имени и вернуть результат в формате json или csv.
+    limit/cursor: постраничная выдача по ключу (дата, порядковый номер строки за дату); несовместима со stream.
     """
+    filters = {"query_name": query_name, "currency": currency.value, "date_from": date_from, "date_to": date_to}
+    after = page_after(limit, cursor, stream, (str, int), filters)
     try:
-        async with FinancialStatsService() as service:
+        if stream:
+            # Сервис живет до конца потока; соединение БД возвращается в пул генератором
+            chunks = FinancialStatsService(engine=engine).stream_query(query_name, date_from, date_to, currency.value)
+            return format_stream_response(chunks, format, f"{query_name}.csv")
+        async with FinancialStatsService(engine=engine) as service:
             data = await service.run_query(
                 query_name,
                 date_from,
                 date_to,
-                currency.value
+                currency.value,
+                incremental=incremental
             )
-        return format_data_response(data, format, f"{query_name}.csv")
+        if limit is None:
+            return format_data_response(data, format, f"{query_name}.csv")
+        page, next_cursor = page_by_date(data, limit, after, filters)
+        return with_next_cursor(format_data_response(page, format, f"{query_name}.csv"), next_cursor)
     except FileNotFoundError as e:
         logger.warning(f"{e}")
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing query: '{query_name}': {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.post("/financial-stats/batch", response_model=FinancialStatsBatchResponse)
+async def external_query_batch(
+    request: FinancialStatsBatchRequest,
+    _: None = Depends(verify_api_key),
+    engine: AsyncEngine = Depends(get_engine)
+):
+    """
+    Выполнить несколько SQL-скриптов с общими фильтрами параллельно (не более REPORT_BATCH_CONCURRENCY одновременно).
+    Возвращает результат, время выполнения и ошибку для каждого скрипта.
+    """
+    if len(request.query_names) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Batch is limited to {MAX_BATCH_QUERIES} queries")
+
+    started = time.perf_counter()
+    results = await FinancialStatsService.run_queries(
+        engine,
+        request.query_names,
+        request.date_from,
+        request.date_to,
+        request.currency.value
+    )
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"Executed batch of {len(results)} queries in {elapsed_ms} ms")
+    return FinancialStatsBatchResponse(elapsed_ms=elapsed_ms, results=results)
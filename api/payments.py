@@ -9,12 +9,15 @@ from fastapi import APIRouter, Query, HTTPException, Response, Header, Depends
 from fastapi.responses import StreamingResponse
 import logging
 
-from services.payment_service import PaymentService
+from services.payment_service import PaymentService, build_payment_batch, build_payment_aggregates, build_payment_page
 from models.payment_model import Payment
+from models.payment_aggregate_model import PaymentAggregate, PaymentGroupBy
 from models.format_enum import FormatEnum
 from utils.currency.constants import Currency
 from core.config import settings
-from utils.formatters import format_data_response
+from core.executor import payment_executor, ExecutorBusyError
+from utils.formatters import format_data_response, format_chunked_response, iter_chunked_body
+from utils.pagination import encode_cursor, page_after, with_next_cursor
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -27,31 +30,116 @@ def verify_api_key(x_api_key: str = Header(...)) -> None:
 @router.get("/payments", response_model=List[Payment])
 async def get_payments(
     file_path: Optional[str] = Query(None, description="Path to the CSV file with payment data"),
-    format: FormatEnum = Query(FormatEnum.json, description="Response format (json or csv)"),
+    format: FormatEnum = Query(FormatEnum.json, description="Response format (json, csv or ndjson)"),
     currency: Currency = Query(Currency.USD, description="Currency for payment amounts"),
     date_from: Optional[str] = Query(None, description="Start date (YYYY-MM-DD) for filtering payments"),
     date_to: Optional[str] = Query(None, description="End date (YYYY-MM-DD) for filtering payments"),
+    stream: bool = Query(False, description="Process the file in chunks and stream the response (memory bounded by chunk size)"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE, description="Page size; payments are ordered by (date, id), the next page cursor is returned in the X-Next-Cursor header"),
+    cursor: Optional[str] = Query(None, description="Cursor of the next page from the X-Next-Cursor header of the previous response"),
     _: None = Depends(verify_api_key)
 ) -> List[Payment]:
     """
     Process payment data from a CSV file and return it in the specified format and currency.
     Если file_path не передан, используется путь из settings.PAYMENTS_FILE_PATH.
     Фильтрация по дате: date_from/date_to в формате YYYY-MM-DD.
+    stream=true: файл обрабатывается частями по CSV_CHUNK_SIZE строк, ответ отдается по мере обработки
+    (дубликаты удаляются только в пределах части).
+    limit/cursor: постраничная выдача по ключу (дата, id, номер строки с этими датой и id); несовместима со stream.
     """
     if not file_path:
         file_path = settings.PAYMENTS_FILE_PATH
+    filters = {"file_path": file_path, "currency": currency.value, "date_from": date_from, "date_to": date_to}
+    after = page_after(limit, cursor, stream, (int, (int, float, str), int), filters)
     if not os.path.exists(file_path):
         logger.error(f"File not found: {file_path}")
         raise HTTPException(status_code=404, detail=f"File not found: {file_path}")
 
     try:
-        service = PaymentService(file_path)
-        payments = service.process_payments(
+        if stream:
+            # Части обрабатываются по мере отправки ответа; поток занимает слот пула воркеров
+            # до конца отправки (при заполненном пуле - 503, как и без stream)
+            chunks = PaymentService(file_path).iter_payment_chunks(
+                target_currency=currency.value,
+                date_from=date_from,
+                date_to=date_to
+            )
+            body = await payment_executor.iterate(iter_chunked_body(chunks, format))
+            return format_chunked_response(body, format, "payments.csv")
+        if limit is not None:
+            # Страница берется срезом общих отсортированных данных; конвертируются только ее строки
+            try:
+                page, next_key = await payment_executor.run(
+                    build_payment_page,
+                    file_path,
+                    limit,
+                    after,
+                    target_currency=currency.value,
+                    date_from=date_from,
+                    date_to=date_to
+                )
+            except ValueError as e:
+                # Ключ курсора не соответствует id файла
+                raise HTTPException(status_code=400, detail=str(e))
+            response = format_data_response(page, format, "payments.csv")
+            return with_next_cursor(response, encode_cursor(next_key, filters) if next_key else None)
+        # Обработка выполняется в пуле воркеров, event loop остается свободным;
+        # результат собирается по столбцам, без создания модели на каждую строку
+        payments = await payment_executor.run(
+            build_payment_batch,
+            file_path,
             target_currency=currency.value,
             date_from=date_from,
             date_to=date_to
         )
         return format_data_response(payments, format, "payments.csv")
+    except HTTPException:
+        raise
+    except ExecutorBusyError as e:
+        logger.warning(f"{e}")
+        raise HTTPException(status_code=503, detail="Server is busy processing payments, retry later",
+                            headers={"Retry-After": "1"})
     except Exception as e:
         logger.error(f"Error processing payment data: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing payment data: {str(e)}")
+
+
+@router.get("/payments/aggregate", response_model=List[PaymentAggregate])
+async def get_payments_aggregate(
+    group_by: List[PaymentGroupBy] = Query([], description="Fields to group by: category, article, sub_article, currency and one of day/week/month"),
+    file_path: Optional[str] = Query(None, description="Path to the CSV file with payment data"),
+    format: FormatEnum = Query(FormatEnum.json, description="Response format (json, csv or ndjson)"),
+    currency: Currency = Query(Currency.USD, description="Currency for aggregated amounts"),
+    date_from: Optional[str] = Query(None, description="Start date (YYYY-MM-DD) for filtering payments"),
+    date_to: Optional[str] = Query(None, description="End date (YYYY-MM-DD) for filtering payments"),
+    _: None = Depends(verify_api_key)
+) -> List[PaymentAggregate]:
+    """
+    Сумма, количество и средний платеж в выбранной валюте по группам.
+    Без group_by — общий итог. Пример: group_by=category&group_by=month.
+    """
+    if len([g for g in group_by if g in PaymentService.PERIODS]) > 1:
+        raise HTTPException(status_code=400, detail="Only one of day, week, month can be used in group_by")
+    if not file_path:
+        file_path = settings.PAYMENTS_FILE_PATH
+    if not os.path.exists(file_path):
+        logger.error(f"File not found: {file_path}")
+        raise HTTPException(status_code=404, detail=f"File not found: {file_path}")
+
+    try:
+        aggregates = await payment_executor.run(
+            build_payment_aggregates,
+            file_path,
+            group_by,
+            target_currency=currency.value,
+            date_from=date_from,
+            date_to=date_to
+        )
+        return format_data_response(aggregates, format, "payments_aggregate.csv")
+    except ExecutorBusyError as e:
+        logger.warning(f"{e}")
+        raise HTTPException(status_code=503, detail="Server is busy processing payments, retry later",
+                            headers={"Retry-After": "1"})
+    except Exception as e:
+        logger.error(f"Error aggregating payment data: {e}")
+        raise HTTPException(status_code=500, detail=f"Error aggregating payment data: {str(e)}")
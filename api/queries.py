@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+import logging
+from typing import Dict, List
+
+from utils.sql_registry import sql_registry
+from core.auth import verify_api_key
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/queries")
+async def list_queries(_: None = Depends(verify_api_key)) -> Dict[str, List[str]]:
+    """
+    Список доступных SQL-скриптов (query_name) для /financial-stats (financial) и /user-activity (activity).
+    """
+    return {
+        namespace: sql_registry.names(sql_dir)
+        for namespace, sql_dir in sql_registry.default_dirs().items()
+    }
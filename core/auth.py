@@ -1,10 +1,12 @@
+from typing import Optional
 from fastapi import Header, HTTPException
 from core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
-def verify_api_key(x_api_key: str = Header(...)) -> None:
+# Заголовок необязателен: отсутствующий ключ дает 401 до остальных зависимостей (а не 422 после них)
+def verify_api_key(x_api_key: Optional[str] = Header(None)) -> None:
     if x_api_key != settings.API_KEY:
         logger.warning(f"Unauthorized access attempt with key: {x_api_key}")
         raise HTTPException(status_code=401, detail="Invalid or missing API key")
@@ -28,13 +28,53 @@ class Settings(BaseSettings):
     
     # Настройки API курсов валют
     EXCHANGE_RATE_API_URL: str = os.getenv("EXCHANGE_RATE_API_URL", "https://api.exchangerate-api.com/v4/latest/USD")
+
+    # Таймаут (секунды), размер пула соединений и число повторов запросов к API курсов валют
+    EXCHANGE_RATE_TIMEOUT: float = float(os.getenv("EXCHANGE_RATE_TIMEOUT", "10"))
+    EXCHANGE_RATE_MAX_CONNECTIONS: int = int(os.getenv("EXCHANGE_RATE_MAX_CONNECTIONS", "10"))
+    EXCHANGE_RATE_RETRIES: int = int(os.getenv("EXCHANGE_RATE_RETRIES", "2"))
+
+    # Кэш курсов валют в памяти процесса (количество таблиц курсов и TTL в секундах)
+    RATE_MEMORY_CACHE_SIZE: int = int(os.getenv("RATE_MEMORY_CACHE_SIZE", "4096"))
+    RATE_MEMORY_CACHE_TTL: int = int(os.getenv("RATE_MEMORY_CACHE_TTL", "3600"))
+    
+    # Режим триангуляции: хранить таблицу курсов только для опорной валюты
+    # и вычислять любую пару через нее
+    CURRENCY_TRIANGULATION: bool = os.getenv("CURRENCY_TRIANGULATION", "false").lower() == "true"
+    CURRENCY_PIVOT: str = os.getenv("CURRENCY_PIVOT", "usd")
+
+    # Предзагрузка курсов валют: число параллельных запросов, прогрев при старте
+    # (базовые валюты через запятую и глубина в днях от текущей даты)
+    RATE_PREFETCH_WORKERS: int = int(os.getenv("RATE_PREFETCH_WORKERS", "8"))
+    RATE_PREFETCH_ON_STARTUP: bool = os.getenv("RATE_PREFETCH_ON_STARTUP", "false").lower() == "true"
+    RATE_PREFETCH_BASES: str = os.getenv("RATE_PREFETCH_BASES", "usd")
+    RATE_PREFETCH_DAYS: int = int(os.getenv("RATE_PREFETCH_DAYS", "30"))
     
     # Путь к файлу с таблицей соответствия категорий
     CATEGORY_MAPPING_PATH: str = os.getenv("CATEGORY_MAPPING_PATH", "data/category_mapping.json")
+    # Интервал проверки изменений файла маппинга (секунды, 0 — не отслеживать)
+    CATEGORY_MAPPING_CHECK_INTERVAL: float = float(os.getenv("CATEGORY_MAPPING_CHECK_INTERVAL", "5"))
     
     # Путь к файлу по умолчанию для платежей Aya
     PAYMENTS_FILE_PATH: str = os.getenv("PAYMENTS_FILE_PATH", "data/pay.aya.csv")
     
+    # Кэш разобранных CSV-файлов в памяти процесса (бюджет в байтах и число файлов)
+    CSV_CACHE_MAX_BYTES: int = int(os.getenv("CSV_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    CSV_CACHE_MAX_ENTRIES: int = int(os.getenv("CSV_CACHE_MAX_ENTRIES", "8"))
+    
+    # Размер части (строк) при потоковой обработке CSV (stream=true)
+    CSV_CHUNK_SIZE: int = int(os.getenv("CSV_CHUNK_SIZE", "100000"))
+    
+    # Бинарные снимки разобранных CSV (memory-mapped), пересоздаются при изменении CSV
+    CSV_SNAPSHOT_ENABLED: bool = os.getenv("CSV_SNAPSHOT_ENABLED", "true").lower() == "true"
+    CSV_SNAPSHOT_DIR: str = os.getenv("CSV_SNAPSHOT_DIR", "data/snapshots")
+    
+    # Пул для обработки платежей: thread или process, число воркеров и максимум ожидающих задач
+    # (при переполнении очереди запрос отклоняется с 503)
+    PAYMENT_EXECUTOR: str = os.getenv("PAYMENT_EXECUTOR", "thread")
+    PAYMENT_WORKERS: int = int(os.getenv("PAYMENT_WORKERS", "4"))
+    PAYMENT_QUEUE_SIZE: int = int(os.getenv("PAYMENT_QUEUE_SIZE", "16"))
+    
     # Статус успешного платежа
     PAYMENT_SUCCESS_STATUS: str = os.getenv("PAYMENT_SUCCESS_STATUS", "Оплачено")
     
@@ -42,8 +82,44 @@ class Settings(BaseSettings):
     API_KEY: str = os.getenv("API_KEY", "changeme")
     # URL для подключения к удалённой БД
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    # Пул соединений к БД (общий для всех запросов процесса)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # Пересоздавать соединения старше указанного времени (секунды, -1 — не пересоздавать)
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # Таймаут выполнения SQL-запроса (секунды)
+    DB_COMMAND_TIMEOUT: float = float(os.getenv("DB_COMMAND_TIMEOUT", "600"))
     # Папка со SQL-скриптами
     SQL_DIR: str = os.getenv("SQL_DIR", "sql")
+    # Интервал проверки изменений SQL-скриптов (секунды, 0 — не отслеживать)
+    SQL_REGISTRY_CHECK_INTERVAL: float = float(os.getenv("SQL_REGISTRY_CHECK_INTERVAL", "5"))
+    
+    # Кэш результатов отчетов: число результатов, TTL по умолчанию (секунды, 0 — без кэша),
+    # сколько секунд после истечения TTL отдавать устаревший результат, пока он пересчитывается,
+    # и TTL отдельных отчетов в формате "query_name=секунды,..."
+    REPORT_CACHE_SIZE: int = int(os.getenv("REPORT_CACHE_SIZE", "256"))
+    REPORT_CACHE_TTL: float = float(os.getenv("REPORT_CACHE_TTL", "60"))
+    REPORT_CACHE_STALE_TTL: float = float(os.getenv("REPORT_CACHE_STALE_TTL", "300"))
+    REPORT_CACHE_TTLS: str = os.getenv("REPORT_CACHE_TTLS", "")
+    
+    # Инкрементальный расчет отчетов: результаты по дням хранятся в SQLite,
+    # запрашиваются только недостающие дни и последние REPORT_MUTABLE_DAYS дней
+    REPORT_INCREMENTAL: bool = os.getenv("REPORT_INCREMENTAL", "false").lower() == "true"
+    REPORT_STORE_PATH: str = os.getenv("REPORT_STORE_PATH", "data/report_store.db")
+    REPORT_MUTABLE_DAYS: int = int(os.getenv("REPORT_MUTABLE_DAYS", "2"))
+    # Размер части (строк) при потоковой выдаче отчетов с серверным курсором (stream=true)
+    REPORT_STREAM_BATCH_SIZE: int = int(os.getenv("REPORT_STREAM_BATCH_SIZE", "10000"))
+    # Сколько отчетов пакетного запроса выполнять одновременно
+    REPORT_BATCH_CONCURRENCY: int = int(os.getenv("REPORT_BATCH_CONCURRENCY", "4"))
+    
+    # Журнал сбросов кэшей, общий для всех воркеров (SQLite), и интервал проверки новых событий (секунды)
+    CACHE_EVENTS_PATH: str = os.getenv("CACHE_EVENTS_PATH", "data/cache_events.db")
+    CACHE_EVENTS_CHECK_INTERVAL: float = float(os.getenv("CACHE_EVENTS_CHECK_INTERVAL", "1"))
+    
+    # Максимальный размер страницы (limit) при постраничной выдаче
+    MAX_PAGE_SIZE: int = int(os.getenv("MAX_PAGE_SIZE", "10000"))
 
     class Config:
         env_file = ".env"
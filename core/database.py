@@ -0,0 +1,76 @@
+"""
+Shared async database engine.
+Общий асинхронный движок базы данных с пулом соединений.
+"""
+
+import logging
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def create_engine(database_url: Optional[str] = None) -> AsyncEngine:
+    """
+    Create an async engine with the pool settings from the configuration.
+
+    Args:
+        database_url: Database URL (settings.DATABASE_URL if not set)
+
+    Returns:
+        AsyncEngine with a connection pool
+    """
+    url = make_url(database_url or settings.DATABASE_URL)
+    # command_timeout — параметр соединения asyncpg
+    connect_args = {"command_timeout": settings.DB_COMMAND_TIMEOUT} if url.get_driver_name() == "asyncpg" else {}
+    return create_async_engine(
+        url,
+        echo=False,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args
+    )
+
+
+def get_engine(request: Request) -> AsyncEngine:
+    """
+    FastAPI dependency returning the application-wide engine created in lifespan.
+
+    Raises:
+        HTTPException: 503 if the database is not configured or the engine failed to start
+    """
+    engine = getattr(request.app.state, "engine", None)
+    if engine is None:
+        raise HTTPException(status_code=503, detail="Database is not available")
+    return engine
+
+
+def pool_stats(engine: Optional[AsyncEngine]) -> dict:
+    """
+    Get connection pool statistics.
+
+    Args:
+        engine: Application engine (None if the database is not available)
+
+    Returns:
+        Dictionary with pool size, checked in/out connections and overflow
+    """
+    if engine is None:
+        return {"available": False}
+    pool = engine.pool
+    stats = {"available": True, "status": pool.status()}
+    # У NullPool/StaticPool нет счетчиков QueuePool
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        counter = getattr(pool, name, None)
+        if callable(counter):
+            stats[name] = counter()
+    stats["max_overflow"] = settings.DB_MAX_OVERFLOW
+    return stats
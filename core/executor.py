@@ -0,0 +1,186 @@
+"""
+Worker pool for CPU-bound request processing.
+Пул воркеров для тяжелой (CPU-bound) обработки запросов.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, Optional
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Признак окончания итератора при вызове next() в пуле
+_END = object()
+
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when the worker pool queue is full."""
+
+
+class WorkerPool:
+    """
+    Bounded thread or process pool for blocking work called from async endpoints.
+
+    At most `workers` jobs run at once and at most `queue_size` more wait
+    for a free worker. Further submissions are rejected immediately with
+    ExecutorBusyError instead of piling up, so the event loop and fast
+    endpoints stay responsive under heavy load. In process mode the
+    function and its arguments and result must be picklable.
+
+    Streamed responses take a slot too (see iterate()), for as long as the
+    response is being sent.
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 4, queue_size: int = 16):
+        """
+        Initialize the worker pool (the executor itself is created on first use).
+
+        Args:
+            kind: 'thread' or 'process'
+            workers: Number of worker threads/processes
+            queue_size: Maximum number of jobs waiting for a free worker
+        """
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor: Optional[Executor] = None
+        # Изменяется только из event loop, блокировка не нужна
+        self._pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> Executor:
+        # Создается лениво: при запуске под gunicorn — уже в процессе воркера, после fork
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="worker-pool")
+            logger.info(f"Started {self.kind} worker pool with {self.workers} workers")
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking function in the pool.
+
+        Args:
+            fn: Function to run (module-level function in process mode)
+            *args, **kwargs: Arguments of the function
+
+        Returns:
+            Result of the function
+
+        Raises:
+            ExecutorBusyError: If all workers are busy and the queue is full
+        """
+        self._acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), partial(fn, *args, **kwargs))
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._pending -= 1
+        self.completed += 1
+        return result
+
+    async def iterate(self, items: Iterable[Any]) -> AsyncIterator[Any]:
+        """
+        Consume a blocking iterator (e.g. the body of a streamed response) holding one slot.
+
+        The slot is taken and the first item is computed before returning, so a
+        full pool raises ExecutorBusyError and early errors surface before the
+        response starts. The slot is released when the iterator is exhausted,
+        fails or is closed. Items are computed in the pool threads (in process
+        mode in the default thread pool: generators cannot be sent to another process).
+
+        Args:
+            items: Blocking iterator
+
+        Returns:
+            Async iterator of the same items
+
+        Raises:
+            ExecutorBusyError: If all workers are busy and the queue is full
+        """
+        iterator = self._iterate(iter(items))
+        try:
+            first = await iterator.__anext__()
+        except StopAsyncIteration:
+            return iterator
+        return self._prepend(first, iterator)
+
+    async def _iterate(self, items: Iterator[Any]) -> AsyncIterator[Any]:
+        self._acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor() if self.kind == "thread" else None
+            while True:
+                item = await loop.run_in_executor(executor, next, items, _END)
+                if item is _END:
+                    break
+                yield item
+        except Exception:
+            self.failed += 1
+            raise
+        else:
+            self.completed += 1
+        finally:
+            self._pending -= 1
+
+    @staticmethod
+    async def _prepend(first: Any, iterator: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        # Итератор уже запущен: даже если ответ не будет отправлен, при сборке мусора
+        # asyncio закроет его и слот освободится
+        try:
+            yield first
+            async for item in iterator:
+                yield item
+        finally:
+            await iterator.aclose()
+
+    def _acquire(self):
+        if self._pending >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise ExecutorBusyError(f"Worker pool is busy ({self._pending} jobs in progress or queued)")
+        self._pending += 1
+
+    def shutdown(self):
+        """Stop the workers (running jobs are finished)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get pool statistics.
+
+        Returns:
+            Dictionary with pool kind, size, queue limit, pending, completed, failed and rejected jobs
+        """
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "pending": self._pending,
+            "running": min(self._pending, self.workers),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+# Пул для обработки платежей (pandas, конвертация валют)
+payment_executor = WorkerPool(
+    kind=settings.PAYMENT_EXECUTOR,
+    workers=settings.PAYMENT_WORKERS,
+    queue_size=settings.PAYMENT_QUEUE_SIZE
+)
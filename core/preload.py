@@ -0,0 +1,92 @@
+"""
+Preload of shared application state before worker processes are forked.
+Подготовка общего состояния приложения до запуска воркеров (gunicorn preload_app).
+"""
+
+import time
+import asyncio
+import logging
+from datetime import date, timedelta
+
+from core.config import settings
+from utils.category_mapper import category_mapper
+from utils.sql_registry import sql_registry
+from utils.currency import CurrencyConverter
+from utils.currency.async_client import async_currency_client
+from utils.sqlite_connections import close_current_thread
+
+logger = logging.getLogger(__name__)
+
+# True в мастере после preload() и, через fork, во всех его воркерах
+preloaded = False
+
+
+async def prefetch_startup_rates():
+    """Warm the currency rate cache for the last RATE_PREFETCH_DAYS days."""
+    bases = [b.strip() for b in settings.RATE_PREFETCH_BASES.split(",") if b.strip()]
+    date_to = date.today()
+    date_from = date_to - timedelta(days=settings.RATE_PREFETCH_DAYS)
+    try:
+        fetched = await CurrencyConverter().aprefetch_rates(bases, date_from, date_to)
+        logger.info(f"Startup rate prefetch done: {fetched} rate tables fetched")
+    except Exception as e:
+        logger.error(f"Startup rate prefetch failed: {e}")
+
+
+async def _prefetch_in_master():
+    try:
+        await prefetch_startup_rates()
+    finally:
+        # Пул соединений привязан к event loop мастера и не должен достаться воркерам
+        await async_currency_client.aclose()
+
+
+def warm_startup_rates() -> int:
+    """
+    Load cached rate tables of the last RATE_PREFETCH_DAYS days from SQLite into memory.
+
+    Returns:
+        Number of rate tables loaded
+    """
+    converter = CurrencyConverter()
+    bases = {
+        converter.rate_base(b.strip())
+        for b in settings.RATE_PREFETCH_BASES.split(",") if b.strip()
+    }
+    date_to = date.today()
+    date_from = date_to - timedelta(days=settings.RATE_PREFETCH_DAYS)
+    return sum(converter.warm_rates(base, date_from, date_to) for base in bases)
+
+
+def preload():
+    """
+    Build read-only state once in the gunicorn master so forked workers share it
+    (copy-on-write) instead of each building its own: category mapping, SQL
+    registry and rate tables from the SQLite cache, plus the startup rate
+    prefetch if RATE_PREFETCH_ON_STARTUP. The application lifespan skips
+    these steps in preloaded workers.
+
+    Must not leave threads, event loops or network clients behind: those do
+    not survive fork and are created per worker in the application lifespan.
+    """
+    global preloaded
+    started = time.perf_counter()
+    mapping = category_mapper.current_version
+    scripts = {
+        namespace: sql_registry.load(sql_dir)
+        for namespace, sql_dir in sql_registry.default_dirs().items()
+    }
+    if settings.RATE_PREFETCH_ON_STARTUP:
+        asyncio.run(_prefetch_in_master())
+    try:
+        rates = warm_startup_rates()
+    except Exception as e:
+        logger.error(f"Preload of rate tables failed: {e}")
+        rates = 0
+    # SQLite-соединения мастера не должны использоваться воркерами после fork
+    close_current_thread()
+    preloaded = True
+    logger.info(
+        f"Preloaded category mapping v{mapping.version} ({len(mapping.lookup)} pairs), "
+        f"SQL scripts {scripts}, {rates} rate tables in {time.perf_counter() - started:.2f}s"
+    )
@@ -0,0 +1,21 @@
+"""
+Gunicorn configuration.
+Конфигурация gunicorn: воркеры uvicorn на все ядра, общее состояние готовится один раз до fork.
+"""
+
+import os
+import multiprocessing
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Приложение импортируется в мастере, воркеры получают его копией при fork
+preload_app = os.getenv("PRELOAD_APP", "true").lower() == "true"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+
+def when_ready(server):
+    """Вызывается в мастере после загрузки приложения, до запуска воркеров."""
+    if server.cfg.preload_app:
+        from core.preload import preload
+        preload()
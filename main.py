@@ -4,11 +4,21 @@ Main application module.
 """
 
 import logging
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from api.api import api_router
 from core.config import settings
+from core.database import create_engine
+from core.executor import payment_executor
+from core import preload
+from utils.cache_events import cache_events
+from utils.category_mapper import category_mapper
+from utils.report_cache import report_cache
+from utils.sql_registry import sql_registry
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.currency.async_client import async_currency_client
 
 # Configure logging
 logging.basicConfig(
@@ -16,6 +26,35 @@ logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
 )
 
+logger = logging.getLogger(__name__)
+
+# Сбросы кэшей через админ-эндпоинты применяются во всех воркерах
+cache_events.register("report_cache", lambda params: report_cache.invalidate(params.get("kind"), params.get("query_name")))
+cache_events.register("category_mapping", lambda params: category_mapper.reload_mapping())
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown of shared application resources."""
+    app.state.engine = None
+    try:
+        app.state.engine = create_engine()
+    except Exception as e:
+        logger.error(f"Database engine was not created, DB endpoints are unavailable: {e}")
+    # SQL-скрипты и курсы уже загружены в мастере gunicorn (preload_app)
+    if not preload.preloaded:
+        for namespace, sql_dir in sql_registry.default_dirs().items():
+            logger.info(f"Loaded {sql_registry.load(sql_dir)} {namespace} SQL scripts from {sql_dir}")
+    if settings.CATEGORY_MAPPING_CHECK_INTERVAL > 0:
+        category_mapper.start_watcher(settings.CATEGORY_MAPPING_CHECK_INTERVAL)
+    if settings.RATE_PREFETCH_ON_STARTUP and not preload.preloaded:
+        await preload.prefetch_startup_rates()
+    yield
+    category_mapper.stop_watcher()
+    await async_currency_client.aclose()
+    payment_executor.shutdown()
+    if app.state.engine is not None:
+        await app.state.engine.dispose()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="Payment Processor API",
@@ -23,6 +62,7 @@ app = FastAPI(
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # Set up CORS
@@ -32,8 +72,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+@app.middleware("http")
+async def apply_cache_events(request: Request, call_next):
+    """Apply cache invalidations published by other workers before handling the request."""
+    cache_events.poll()
+    return await call_next(request)
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
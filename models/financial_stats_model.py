@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import date
+from typing import List, Optional
 from utils.currency.constants import Currency
 
 class FinancialStatsResult(BaseModel):
@@ -10,3 +11,31 @@ class FinancialStatsResult(BaseModel):
     date: date
     amount: float
     currency: Currency
+
+
+class FinancialStatsBatchRequest(BaseModel):
+    """
+    Запрос на выполнение нескольких SQL-отчетов с общими фильтрами.
+    """
+    query_names: List[str] = Field(..., min_length=1, description="Имена SQL-скриптов без расширения")
+    currency: Currency = Currency.USD
+    date_from: Optional[str] = Field(None, description="Start date (YYYY-MM-DD) for filtering")
+    date_to: Optional[str] = Field(None, description="End date (YYYY-MM-DD) for filtering")
+
+
+class FinancialStatsBatchItem(BaseModel):
+    """
+    Результат одного отчета в пакетном запросе: строки или ошибка и время выполнения.
+    """
+    query_name: str
+    elapsed_ms: float
+    error: Optional[str] = None
+    rows: List[FinancialStatsResult] = []
+
+
+class FinancialStatsBatchResponse(BaseModel):
+    """
+    Результаты пакетного запроса в порядке query_names и общее время выполнения.
+    """
+    elapsed_ms: float
+    results: List[FinancialStatsBatchItem]
@@ -4,3 +4,4 @@ from enum import Enum
 class FormatEnum(str, Enum):
     json = "json"
     csv = "csv"
+    ndjson = "ndjson"
@@ -0,0 +1,35 @@
+from enum import Enum
+from pydantic import BaseModel
+from typing import Optional
+from datetime import date
+
+
+class PaymentGroupBy(str, Enum):
+    """
+    Поля группировки платежей. day/week/month — период по дате платежа (не более одного).
+    """
+    category = "category"
+    article = "article"
+    sub_article = "sub_article"
+    currency = "currency"
+    day = "day"
+    week = "week"
+    month = "month"
+
+
+class PaymentAggregate(BaseModel):
+    """
+    Итог по группе платежей в целевой валюте.
+    Заполнены только поля, выбранные в group_by; period — первый день дня/недели/месяца,
+    currency — исходная валюта платежей как в файле (может не входить в Currency).
+    Платежи без курса не входят в count/sum/avg и учитываются в unconverted.
+    """
+    period: Optional[date] = None
+    category: Optional[str] = None
+    article: Optional[str] = None
+    sub_article: Optional[str] = None
+    currency: Optional[str] = None
+    count: int
+    sum: float
+    avg: float
+    unconverted: int = 0
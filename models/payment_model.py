@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
 from utils.currency.constants import Currency
 
@@ -15,3 +15,36 @@ class Payment(BaseModel):
     article: str
     sub_article: str
     category: Optional[str] = None
+
+
+class PaymentBatch:
+    """
+    Column-oriented набор платежей: по одному списку значений на поле Payment.
+    Позволяет сериализовать большие ответы без создания модели на каждую строку;
+    модели Payment создаются (без повторной валидации) только при итерации.
+    """
+    fields: Tuple[str, ...] = tuple(Payment.model_fields)
+
+    def __init__(self, columns: Dict[str, List[Any]]):
+        missing = [field for field in self.fields if field not in columns]
+        if missing:
+            raise ValueError(f"PaymentBatch columns missing: {missing}")
+        lengths = {len(columns[field]) for field in self.fields}
+        if len(lengths) > 1:
+            raise ValueError("PaymentBatch columns must have equal length")
+        self.columns = {field: columns[field] for field in self.fields}
+
+    def __len__(self) -> int:
+        return len(self.columns[self.fields[0]])
+
+    def __iter__(self) -> Iterator[Payment]:
+        for values in self.rows():
+            yield Payment.model_construct(**dict(zip(self.fields, values)))
+
+    def rows(self) -> Iterator[Tuple[Any, ...]]:
+        """Values of every payment in the order of fields."""
+        return zip(*(self.columns[field] for field in self.fields))
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Payments as plain dictionaries."""
+        return [dict(zip(self.fields, values)) for values in self.rows()]
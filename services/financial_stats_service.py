@@ -3,18 +3,22 @@
 """
 
 import os
+import time
+import asyncio
 import logging
-from typing import List
-import sqlalchemy
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
+from typing import AsyncIterator, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker
 from datetime import date
+from functools import partial
 
 from core.config import settings
-from models.financial_stats_model import FinancialStatsResult
-from utils.load_sql_file import load_sql_file
+from core.database import create_engine
+from models.financial_stats_model import FinancialStatsResult, FinancialStatsBatchItem
+from utils.sql_registry import sql_registry, SQLScript
+from utils.report_cache import report_cache
+from utils.report_store import report_store
 from utils.currency import CurrencyConverter
-from utils.currency.constants import Currency, ConversionResult
 
 logger = logging.getLogger(__name__)
 SUB_DIR = "/financial"
@@ -23,10 +27,12 @@ class FinancialStatsService:
     """
     Сервис для выполнения внешних SQL-запросов из файлов для получения финансовой статистики.
     """
-    def __init__(self, database_url: str = None, sql_dir: str = None):
+    def __init__(self, database_url: str = None, sql_dir: str = None, engine: AsyncEngine = None):
         self.database_url = database_url or settings.DATABASE_URL
         self.sql_dir = sql_dir or settings.SQL_DIR + SUB_DIR
-        self.engine: AsyncEngine = create_async_engine(self.database_url, echo=False, connect_args={"command_timeout": 600})
+        # Общий движок приложения передается снаружи; собственный создается и закрывается только без него
+        self._owns_engine = engine is None
+        self.engine: AsyncEngine = engine or create_engine(self.database_url)
         self.session_factory = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
         self.converter = CurrencyConverter()
 
@@ -34,11 +40,8 @@ class FinancialStatsService:
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.converter and self.converter.cache.connection:
-            self.converter.cache.connection.close()
-            self.converter.cache.connection = None
-            logger.debug("Closed currency cache connection")
-        await self.engine.dispose()
+        if self._owns_engine:
+            await self.engine.dispose()
 
     def _parse_date(self, s: str) -> date:
         try:
@@ -46,58 +49,137 @@ class FinancialStatsService:
         except Exception:
             return None
 
-    async def run_query(self, query_name: str, date_from: str = None, date_to: str = None, currency: str = "USD") -> List[FinancialStatsResult]:
-        query = load_sql_file(self.sql_dir, query_name)
+    async def run_query(self, query_name: str, date_from: str = None, date_to: str = None, currency: str = "USD",
+                        use_cache: bool = True, incremental: bool = None) -> List[FinancialStatsResult]:
+        script = sql_registry.get(self.sql_dir, query_name)
 
         params = {
             "date_from": self._parse_date(date_from) if date_from else None,
             "date_to": self._parse_date(date_to) if date_to else None
         }
-
-        financial_data: List[FinancialStatsResult] = []
         target_currency = (currency or "USD").upper()
+        if incremental is None:
+            incremental = settings.REPORT_INCREMENTAL
 
-        try:
-            async with self.session_factory() as session:
+        if not use_cache:
+            return await self._execute(script, params, target_currency, incremental)
+        # Контрольная сумма скрипта в ключе: изменение SQL-файла не отдает старые результаты
+        key = ("financial", query_name, script.checksum, params["date_from"], params["date_to"], target_currency)
+        return await report_cache.get_or_compute(
+            key, lambda: self._execute(script, params, target_currency, incremental)
+        )
+
+    @classmethod
+    async def run_queries(cls, engine: AsyncEngine, query_names: List[str], date_from: str = None,
+                          date_to: str = None, currency: str = "USD",
+                          concurrency: int = None) -> List[FinancialStatsBatchItem]:
+        """
+        Выполнить несколько отчетов параллельно (не более concurrency одновременно) на общем пуле соединений.
+        Ошибка одного отчета не прерывает остальные и возвращается в его результате.
+        """
+        service = cls(engine=engine)
+        semaphore = asyncio.Semaphore(concurrency or settings.REPORT_BATCH_CONCURRENCY)
+
+        async def run_one(query_name: str) -> FinancialStatsBatchItem:
+            async with semaphore:
+                started = time.perf_counter()
+                rows, error = [], None
                 try:
-                    result = await session.execute(sqlalchemy.text(query), params)
-                    records = [dict(r) for r in result.mappings()]
-                    logger.info(f"Executed query '{query_name}', returned {len(records)} rows")
-                    for row in records:
-                        row_currency = row["currency"].upper()
-                        amount = float(row["amount"])
-                        date_val = row["date"]
-                        try:
-                            if row_currency != target_currency:
-                                conv_result: ConversionResult = self.converter.safe_convert(
-                                    amount=amount,
-                                    from_currency=row_currency,
-                                    to_currency=target_currency,
-                                    request_date=date_val,
-                                    default_value=amount
-                                )
-                                amount = conv_result.converted_amount
-                                row_currency = conv_result.to_currency.value
-                                logger.debug(f"Converted amount: {conv_result}")
-                            financial_data.append(FinancialStatsResult(
-                                date=date_val,
-                                amount=round(amount, 2),
-                                currency=row_currency
-                            ))
-                        except Exception as e:
-                            logger.error(f"Currency conversion error for row {row}: {e}")
-                            financial_data.append(FinancialStatsResult(
-                                date=date_val,
-                                amount=round(amount, 2),
-                                currency=row_currency
-                            ))
+                    rows = await service.run_query(query_name, date_from, date_to, currency)
+                except FileNotFoundError as e:
+                    error = str(e)
                 except Exception as e:
-                    logger.error(f"Database error executing query '{query_name}': {e}")
-                    raise
-        finally:
-            if self.converter and self.converter.cache.connection:
-                self.converter.cache.connection.close()
-                self.converter.cache.connection = None
-                logger.debug("Closed currency cache connection")
+                    logger.error(f"Error processing query: '{query_name}': {e}")
+                    error = "Internal server error"
+                return FinancialStatsBatchItem(
+                    query_name=query_name,
+                    elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+                    error=error,
+                    rows=rows
+                )
+
+        return list(await asyncio.gather(*(run_one(name) for name in dict.fromkeys(query_names))))
+
+    async def _fetch_records(self, script: SQLScript, date_from: Optional[date], date_to: Optional[date]) -> List[dict]:
+        async with self.session_factory() as session:
+            try:
+                result = await session.execute(script.statement, {"date_from": date_from, "date_to": date_to})
+                records = [dict(r) for r in result.mappings()]
+                logger.info(f"Executed query '{script.name}', returned {len(records)} rows")
+                return records
+            except Exception as e:
+                logger.error(f"Database error executing query '{script.name}': {e}")
+                raise
+
+    async def _execute(self, script: SQLScript, params: dict, target_currency: str,
+                       incremental: bool = False) -> List[FinancialStatsResult]:
+        query_name = script.name
+
+        if incremental and params["date_from"] and params["date_to"]:
+            # Сохраненные дни берутся из хранилища, запрашиваются только недостающие;
+            # конвертация валют выполняется после объединения
+            records = await report_store.load_range(
+                "financial", script, params["date_from"], params["date_to"], partial(self._fetch_records, script)
+            )
+        else:
+            records = await self._fetch_records(script, params["date_from"], params["date_to"])
+        financial_data = await self._convert_records(records, target_currency)
         logger.info(f"Successfully executed query '{query_name}' with {len(financial_data)} records")
         return financial_data
+
+    def stream_query(self, query_name: str, date_from: str = None, date_to: str = None, currency: str = "USD",
+                     batch_size: int = None) -> AsyncIterator[List[FinancialStatsResult]]:
+        """
+        Выполнить запрос с серверным курсором и отдавать результат частями по batch_size строк.
+        Скрипт проверяется сразу (FileNotFoundError до начала ответа), запрос выполняется при итерации.
+        Кэш и хранилище отчетов не используются.
+        """
+        script = sql_registry.get(self.sql_dir, query_name)
+        params = {
+            "date_from": self._parse_date(date_from) if date_from else None,
+            "date_to": self._parse_date(date_to) if date_to else None
+        }
+        return self._stream(script, params, (currency or "USD").upper(), batch_size or settings.REPORT_STREAM_BATCH_SIZE)
+
+    async def _stream(self, script: SQLScript, params: dict, target_currency: str,
+                      batch_size: int) -> AsyncIterator[List[FinancialStatsResult]]:
+        total = 0
+        try:
+            async with self.engine.connect() as conn:
+                result = await conn.stream(script.statement, params, execution_options={"yield_per": batch_size})
+                async for rows in result.mappings().partitions(batch_size):
+                    batch = await self._convert_records([dict(r) for r in rows], target_currency)
+                    total += len(batch)
+                    yield batch
+        except Exception as e:
+            logger.error(f"Database error streaming query '{script.name}': {e}")
+            raise
+        logger.info(f"Streamed query '{script.name}' with {total} records")
+
+    async def _convert_records(self, records: List[dict], target_currency: str) -> List[FinancialStatsResult]:
+        financial_data: List[FinancialStatsResult] = []
+        # Курсы по каждой паре (валюта, дата) получаем заранее и асинхронно; без курса
+        # сумма остается исходной, как safe_convert(default_value=amount)
+        rates = await self.converter.aget_rates(
+            {(row["currency"].upper(), row["date"]) for row in records if row["currency"].upper() != target_currency},
+            target_currency
+        )
+        failed = 0
+        for row in records:
+            row_currency = row["currency"].upper()
+            amount = float(row["amount"])
+            if row_currency != target_currency:
+                rate = rates[(row_currency, row["date"])]
+                if rate:
+                    amount = amount / rate
+                else:
+                    failed += 1
+                row_currency = target_currency
+            financial_data.append(FinancialStatsResult(
+                date=row["date"],
+                amount=round(amount, 2),
+                currency=row_currency
+            ))
+        if failed:
+            logger.warning(f"{failed} rows kept their original amount: rate not found")
+        return financial_data
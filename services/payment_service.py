@@ -1,16 +1,75 @@
-from typing import List, Optional
+from typing import Any, Iterator, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 import logging
 from utils.csv_processor import CSVProcessor
-from utils.category_mapper import map_category
+from utils.category_mapper import map_categories
 from utils.currency import CurrencyConverter
-from utils.currency.constants import Currency, ConversionResult
 from core.config import settings
-from models.payment_model import Payment
-from datetime import datetime
+from models.payment_model import Payment, PaymentBatch
+from models.payment_aggregate_model import PaymentAggregate, PaymentGroupBy
+from utils.currency.constants import Currency
 
 logger = logging.getLogger(__name__)
 
+
+def build_payment_batch(file_path: Optional[str], target_currency: str = "USD",
+                        date_from: Optional[str] = None, date_to: Optional[str] = None) -> PaymentBatch:
+    """
+    Process a payments file into a PaymentBatch.
+
+    Module-level so it can be dispatched to a process pool (see core.executor).
+
+    Args:
+        file_path: Path to the CSV file (settings.PAYMENTS_FILE_PATH if not set)
+        target_currency: Currency for payment amounts
+        date_from: Start date (YYYY-MM-DD) for filtering
+        date_to: End date (YYYY-MM-DD) for filtering
+
+    Returns:
+        PaymentBatch with one list per Payment field
+    """
+    return PaymentService(file_path).process_payments_batch(target_currency, date_from, date_to)
+
+
+def build_payment_aggregates(file_path: Optional[str], group_by: List[PaymentGroupBy], target_currency: str = "USD",
+                             date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[PaymentAggregate]:
+    """
+    Aggregate a payments file (module-level so it can be dispatched to a process pool).
+
+    Args:
+        file_path: Path to the CSV file (settings.PAYMENTS_FILE_PATH if not set)
+        group_by: Fields to group by
+        target_currency: Currency for payment amounts
+        date_from: Start date (YYYY-MM-DD) for filtering
+        date_to: End date (YYYY-MM-DD) for filtering
+
+    Returns:
+        List of PaymentAggregate, one per group
+    """
+    return PaymentService(file_path).aggregate_payments(group_by, target_currency, date_from, date_to)
+
+
+def build_payment_page(file_path: Optional[str], limit: int, after: Optional[Tuple[int, Any]] = None,
+                       target_currency: str = "USD", date_from: Optional[str] = None,
+                       date_to: Optional[str] = None) -> Tuple[PaymentBatch, Optional[Tuple[int, Any]]]:
+    """
+    Build one page of payments (module-level so it can be dispatched to a process pool).
+
+    Args:
+        file_path: Path to the CSV file (settings.PAYMENTS_FILE_PATH if not set)
+        limit: Page size
+        after: Key (date in ns, id, ordinal) of the last payment of the previous page (first page if None)
+        target_currency: Currency for payment amounts
+        date_from: Start date (YYYY-MM-DD) for filtering
+        date_to: End date (YYYY-MM-DD) for filtering
+
+    Returns:
+        Tuple of (PaymentBatch of the page, key of its last payment or None on the last page)
+    """
+    return PaymentService(file_path).payments_page(limit, after, target_currency, date_from, date_to)
+
+
 class PaymentService:
     """
     Сервис для обработки платежей из CSV-файла.
@@ -20,25 +79,252 @@ class PaymentService:
         self.processor: CSVProcessor = CSVProcessor(self.file_path)
         logger.info(f"PaymentService initialized with file: {self.file_path}")
 
+    REQUIRED_COLUMNS: List[str] = ["id", "Дата", "Статус", "Сумма", "Валюта", "Статья", "Подстатья"]
+
+    # Столбцы обработанных данных для группировки и частоты периодов (pandas)
+    GROUP_COLUMNS = {
+        PaymentGroupBy.category: "category",
+        PaymentGroupBy.article: "Статья",
+        PaymentGroupBy.sub_article: "Подстатья",
+        PaymentGroupBy.currency: "source_currency",
+    }
+    PERIODS = {PaymentGroupBy.day: "D", PaymentGroupBy.week: "W", PaymentGroupBy.month: "M"}
+
     def process_payments(self, target_currency: str = "USD", date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Payment]:
+        payments: List[Payment] = list(self.process_payments_batch(target_currency, date_from, date_to))
+        logger.info(f"Successfully created {len(payments)} Payment models.")
+        return payments
+
+    def process_payments_batch(self, target_currency: str = "USD", date_from: Optional[str] = None,
+                               date_to: Optional[str] = None) -> PaymentBatch:
+        """
+        Process payments into a column-oriented PaymentBatch without per-row models.
+
+        Args:
+            target_currency: Currency for payment amounts
+            date_from: Start date (YYYY-MM-DD) for filtering
+            date_to: End date (YYYY-MM-DD) for filtering
+
+        Returns:
+            PaymentBatch with one list per Payment field
+        """
+        return self._to_batch(self._process_frame(target_currency, date_from, date_to)[0])
+
+    def aggregate_payments(self, group_by: List[PaymentGroupBy], target_currency: str = "USD",
+                           date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[PaymentAggregate]:
+        """
+        Sum, count and average payment amounts in the target currency per group.
+
+        Amounts are converted in batch first, then grouped with a single pandas groupby.
+        Currency groups are by the original payment currency. Payments whose
+        rate was not found are left out of sum/count/avg and counted in
+        `unconverted`, so totals never mix currencies.
+
+        Args:
+            group_by: Fields to group by (at most one of day/week/month); empty for overall totals
+            target_currency: Currency for payment amounts
+            date_from: Start date (YYYY-MM-DD) for filtering
+            date_to: End date (YYYY-MM-DD) for filtering
+
+        Returns:
+            List of PaymentAggregate ordered by group keys
+
+        Raises:
+            ValueError: If more than one period is requested
+        """
+        group_by = list(dict.fromkeys(PaymentGroupBy(g) for g in group_by))
+        if len([g for g in group_by if g in self.PERIODS]) > 1:
+            raise ValueError("Only one of day, week, month can be used in group_by")
+
+        processed_data, converted_mask = self._process_frame(target_currency, date_from, date_to)
+        values = pd.DataFrame({
+            "amount": processed_data["Сумма"].astype(float).where(converted_mask),
+            "unconverted": ~converted_mask
+        }, index=processed_data.index)
+        keys = []
+        for g in group_by:
+            if g in self.PERIODS:
+                key = processed_data["Дата"].dt.to_period(self.PERIODS[g]).dt.start_time.rename("period")
+            else:
+                key = processed_data[self.GROUP_COLUMNS[g]].rename(g.value)
+            keys.append(key)
+
+        if keys:
+            grouped = values.groupby(keys, dropna=False, sort=True, observed=True).agg(
+                sum=("amount", "sum"), count=("amount", "count"),
+                mean=("amount", "mean"), unconverted=("unconverted", "sum")
+            ).reset_index()
+        else:
+            grouped = pd.DataFrame({
+                "sum": [values["amount"].sum()],
+                "count": [values["amount"].count()],
+                "mean": [values["amount"].mean()],
+                "unconverted": [values["unconverted"].sum()]
+            })
+        grouped["sum"] = grouped["sum"].round(2)
+        # Группа без сконвертированных платежей: среднее 0, как и для пустой выборки
+        grouped["mean"] = grouped["mean"].fillna(0.0).round(2)
+        if "period" in grouped:
+            grouped["period"] = grouped["period"].dt.date
+
+        aggregates = []
+        for row in grouped.astype(object).where(grouped.notna(), None).to_dict("records"):
+            aggregates.append(PaymentAggregate(
+                period=row.get("period"),
+                category=row.get("category"),
+                article=row.get("article"),
+                sub_article=row.get("sub_article"),
+                currency=row.get("currency"),
+                count=row["count"],
+                sum=row["sum"],
+                avg=row["mean"],
+                unconverted=row["unconverted"]
+            ))
+        logger.info(f"Aggregated {len(processed_data)} payments into {len(aggregates)} groups by {[g.value for g in group_by]}")
+        return aggregates
+
+    def payments_page(self, limit: int, after: Optional[Tuple[int, Any]] = None, target_currency: str = "USD",
+                      date_from: Optional[str] = None, date_to: Optional[str] = None) -> Tuple[PaymentBatch, Optional[Tuple[int, Any]]]:
+        """
+        Get one page of payments ordered by (date, id, row order).
+
+        Pages are slices of the shared normalized data from the CSV cache, which
+        is sorted by (date, id) (see CSVProcessor.sort_by_date): the date range
+        and the page start are found by binary search, successful payments are
+        picked from the following rows block by block, and only the rows of the
+        page get categories and currency conversion. Payments without a date
+        are not paged.
+
+        Args:
+            limit: Page size
+            after: Key (date in ns, id, ordinal among the rows with this date and id) of the
+                   last payment of the previous page (first page if None)
+            target_currency: Currency for payment amounts
+            date_from: Start date (YYYY-MM-DD) for filtering
+            date_to: End date (YYYY-MM-DD) for filtering
+
+        Returns:
+            Tuple of (PaymentBatch of the page, key of its last payment or None on the last page)
+
+        Raises:
+            ValueError: If the id type of the key does not match the ids of the file
+        """
+        data = self.processor.read_csv(use_cache=True)
+        rows = self.processor.date_range(data, "Дата", date_from, date_to)
+        numeric_ids = rows["id"].dtype.kind in "iuf"
+
+        start = 0
+        if after is not None:
+            if numeric_ids == isinstance(after[1], str) or after[2] < 0:
+                raise ValueError("Invalid cursor")
+            key_start, key_end = self._key_rows(rows, after[0], after[1])
+            # Строки с одинаковыми (дата, id) различаются порядковым номером в сортированных данных
+            start = min(key_start + after[2] + 1, key_end)
+
+        # Успешные платежи ищутся блоками растущего размера: одна лишняя строка показывает, есть ли следующая страница
+        status = rows["Статус"]
+        positions, position, block = [], start, limit + 1
+        found = 0
+        while position < len(rows) and found <= limit:
+            matched = np.flatnonzero((status.iloc[position:position + block] == settings.PAYMENT_SUCCESS_STATUS).to_numpy())
+            positions.append(position + matched)
+            found += len(matched)
+            position += block
+            block *= 2
+        positions = np.concatenate(positions) if positions else np.empty(0, dtype=np.intp)
+
+        page = rows.iloc[positions[:limit]][self.REQUIRED_COLUMNS].copy()
+        next_key = None
+        if len(positions) > limit:
+            last_id = page["id"].iloc[-1]
+            last_date = int(page["Дата"].iloc[-1].value)
+            last_id = last_id.item() if numeric_ids else str(last_id)
+            key_start, _ = self._key_rows(rows, last_date, last_id)
+            next_key = (last_date, last_id, int(positions[limit - 1]) - key_start)
+
+        processed_data, _ = self._transform(page, target_currency, CurrencyConverter())
+        logger.info(f"Payments page of {len(page)} from row {start} of {len(rows)}")
+        return self._to_batch(processed_data), next_key
+
+    @staticmethod
+    def _key_rows(rows: pd.DataFrame, date: int, payment_id: Any) -> Tuple[int, int]:
+        """Positions [start, end) of the rows with the page key (date in ns, id) in rows sorted by (date, id)."""
+        dates = rows["Дата"].to_numpy()
+        key_date = np.datetime64(date, "ns")
+        lo, hi = int(dates.searchsorted(key_date, side="left")), int(dates.searchsorted(key_date, side="right"))
+        ids = CSVProcessor.id_sort_values(rows["id"].iloc[lo:hi]).to_numpy()
+        return lo + int(ids.searchsorted(payment_id, side="left")), lo + int(ids.searchsorted(payment_id, side="right"))
+
+    def _process_frame(self, target_currency: str, date_from: Optional[str],
+                       date_to: Optional[str]) -> Tuple[pd.DataFrame, np.ndarray]:
         logger.info(f"Start processing payments. Target currency: {target_currency}, date_from: {date_from}, date_to: {date_to}")
-        self.processor.read_csv()
-        required_columns: List[str] = ["id", "Дата", "Статус", "Сумма", "Валюта", "Статья", "Подстатья"]
+        self.processor.read_csv(use_cache=True)
         processed_data: pd.DataFrame = self.processor.prepare_data(
-            required_columns=required_columns,
+            required_columns=self.REQUIRED_COLUMNS,
             status=settings.PAYMENT_SUCCESS_STATUS,
             date_from=date_from,
             date_to=date_to
         )
 
+        # Создаем конвертер один раз для всех операций
+        converter = CurrencyConverter()
+        processed_data, converted_mask = self._transform(processed_data, target_currency, converter)
+        logger.info(f"Total processed payments: {len(processed_data)}")
+        return processed_data, converted_mask
+
+    def iter_payment_chunks(self, target_currency: str = "USD", date_from: Optional[str] = None,
+                            date_to: Optional[str] = None, chunksize: Optional[int] = None) -> Iterator[PaymentBatch]:
+        """
+        Process the CSV file chunk by chunk and yield a PaymentBatch per chunk.
+
+        Peak memory is bounded by the chunk size instead of the file size.
+        Duplicates are only dropped within a chunk.
+
+        Args:
+            target_currency: Currency for payment amounts
+            date_from: Start date (YYYY-MM-DD) for filtering
+            date_to: End date (YYYY-MM-DD) for filtering
+            chunksize: Number of CSV rows per chunk (default: settings.CSV_CHUNK_SIZE)
+
+        Yields:
+            PaymentBatch of one chunk
+        """
+        logger.info(f"Start streaming payments. Target currency: {target_currency}, date_from: {date_from}, date_to: {date_to}")
+        converter = CurrencyConverter()
+        total = 0
+        for chunk in self.processor.iter_prepared_chunks(
+            chunksize=chunksize or settings.CSV_CHUNK_SIZE,
+            required_columns=self.REQUIRED_COLUMNS,
+            status=settings.PAYMENT_SUCCESS_STATUS,
+            date_from=date_from,
+            date_to=date_to
+        ):
+            if chunk.empty:
+                continue
+            payments = self._to_batch(self._transform(chunk, target_currency, converter)[0])
+            total += len(payments)
+            yield payments
+        logger.info(f"Successfully streamed {total} payments.")
+
+    def _transform(self, processed_data: pd.DataFrame, target_currency: str,
+                   converter: CurrencyConverter) -> Tuple[pd.DataFrame, np.ndarray]:
+        """
+        Map categories and convert amounts of prepared payment rows.
+
+        The original currency is kept in the `source_currency` column.
+
+        Returns:
+            Tuple of (processed rows, boolean mask of rows whose amount was converted)
+        """
+        converted_mask = np.ones(len(processed_data), dtype=bool)
         # Категории
         article_columns: List[str] = [col for col in processed_data.columns if col.lower() in ["article", "статья"]]
         sub_article_columns: List[str] = [col for col in processed_data.columns if col.lower() in ["sub_article", "sub-article", "подстатья"]]
         if article_columns and sub_article_columns:
             article_col = article_columns[0]
             sub_article_col = sub_article_columns[0]
-            processed_data["category"] = processed_data.apply(
-                lambda row: map_category(str(row[article_col]), str(row[sub_article_col])), axis=1
+            processed_data["category"], _ = map_categories(
+                processed_data[article_col], processed_data[sub_article_col]
             )
             logger.info("Categories mapped for payments.")
 
@@ -46,58 +332,46 @@ class PaymentService:
         amount_columns: List[str] = [col for col in processed_data.columns if col.lower() in ["amount", "сумма"]]
         currency_columns: List[str] = [col for col in processed_data.columns if col.lower() in ["currency", "валюта"]]
         date_columns: List[str] = [col for col in processed_data.columns if col.lower() in ["date", "дата"]]
-        
-        converter = None
-        try:
-            if amount_columns and currency_columns and date_columns:
-                amount_col = amount_columns[0]
-                currency_col = currency_columns[0]
-                date_col = date_columns[0]
-                
-                # Создаем конвертер один раз для всех операций
-                converter = CurrencyConverter()
-                
-                for idx, row in processed_data.iterrows():
-                    source_currency = str(row[currency_col]).upper()
-                    if source_currency != target_currency:
-                        try:
-                            result: ConversionResult = converter.safe_convert(
-                                amount=float(row[amount_col]),  # Преобразуем в float для конвертации
-                                from_currency=source_currency,
-                                to_currency=target_currency,
-                                request_date=row[date_col],
-                                default_value=float(row[amount_col])  # если конвертация не удалась, оставляем исходную сумму
-                            )
-                            processed_data.at[idx, amount_col] = result.converted_amount
-                            processed_data.at[idx, currency_col] = result.to_currency.value
-                            logger.debug(f"Converted payment: {result}")
-                        except Exception as e:
-                            logger.error(f"Currency conversion error for row {idx}: {e}")
-                            # Оставляем исходные значения
-                            continue
-                            
-            logger.info(f"Total processed payments: {len(processed_data)}")
-
-            # Формируем список моделей Payment
-            payments: List[Payment] = [
-                Payment(
-                    id=str(row["id"]),
-                    date=row["Дата"],
-                    status=row["Статус"],
-                    amount=round(row["Сумма"], 2),
-                    currency=row["Валюта"],
-                    article=row["Статья"],
-                    sub_article=row["Подстатья"],
-                    category=row.get("category", None)
-                )
-                for _, row in processed_data.iterrows()
-            ]
-            logger.info(f"Successfully created {len(payments)} Payment models.")
-            return payments
-
-        finally:
-            # Закрываем соединение с кэшем, если конвертер был создан
-            if converter and converter.cache.connection:
-                converter.cache.connection.close()
-                converter.cache.connection = None
-                logger.debug("Closed currency cache connection")
+
+        if amount_columns and currency_columns and date_columns:
+            amount_col = amount_columns[0]
+            currency_col = currency_columns[0]
+            date_col = date_columns[0]
+
+            converted, converted_mask = converter.convert_batch(
+                amounts=processed_data[amount_col],
+                from_currencies=processed_data[currency_col],
+                to_currency=target_currency,
+                request_dates=processed_data[date_col]
+            )
+            processed_data["source_currency"] = processed_data[currency_col]
+            processed_data[amount_col] = converted
+            # Как и safe_convert(default_value=...): при ошибке сумма остается исходной
+            processed_data[currency_col] = target_currency
+            if not converted_mask.all():
+                logger.warning(f"{int((~converted_mask).sum())} payments kept their original amount: rate not found")
+        return processed_data, converted_mask
+
+    @staticmethod
+    def _to_batch(processed_data: pd.DataFrame) -> PaymentBatch:
+        """
+        Build a PaymentBatch from processed payment rows column by column.
+
+        Values are coerced to the Payment field types (models are not validated
+        again); payments without a parseable date cannot be represented and are skipped.
+        """
+        dated = processed_data["Дата"].notna()
+        if not dated.all():
+            logger.warning(f"{int((~dated).sum())} payments skipped: missing or unparseable date")
+            processed_data = processed_data[dated]
+        currencies = {value: Currency(value) for value in processed_data["Валюта"].unique()}
+        return PaymentBatch({
+            "id": processed_data["id"].astype(str).tolist(),
+            "date": processed_data["Дата"].astype(object).tolist(),
+            "status": processed_data["Статус"].astype(str).tolist(),
+            "amount": processed_data["Сумма"].astype(float).round(2).tolist(),
+            "currency": processed_data["Валюта"].map(currencies).tolist(),
+            "article": processed_data["Статья"].astype(str).tolist(),
+            "sub_article": processed_data["Подстатья"].astype(str).tolist(),
+            "category": processed_data["category"].tolist() if "category" in processed_data else [None] * len(processed_data),
+        })
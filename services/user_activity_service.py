@@ -1,13 +1,16 @@
 import os
 import logging
 from datetime import date
-from typing import List, Optional
-import sqlalchemy
+from functools import partial
+from typing import AsyncIterator, List, Optional
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine
 
 from core.config import settings
-from utils.load_sql_file import load_sql_file
+from core.database import create_engine
+from utils.sql_registry import sql_registry, SQLScript
+from utils.report_cache import report_cache
+from utils.report_store import report_store
 from models.user_activity_model import ActiveUsersResult
 
 logger = logging.getLogger(__name__)
@@ -17,12 +20,21 @@ class UserActivityService:
     """
     Сервис для выполнения внешних SQL-запросов из файлов для получения статистику по активности.
     """
-    def __init__(self, database_url: str = None, sql_dir: str = None):
+    def __init__(self, database_url: str = None, sql_dir: str = None, engine: AsyncEngine = None):
         self.database_url = database_url or settings.DATABASE_URL
         self.sql_dir = sql_dir or settings.SQL_DIR + SUB_DIR
-        self.engine: AsyncEngine = create_async_engine(self.database_url, echo=False, connect_args={"command_timeout": 600})
+        # Общий движок приложения передается снаружи; собственный создается и закрывается только без него
+        self._owns_engine = engine is None
+        self.engine: AsyncEngine = engine or create_engine(self.database_url)
         self.session_factory = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
 
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self._owns_engine:
+            await self.engine.dispose()
+
     def _parse_date(self, s: str) -> date:
         try:
             return date.fromisoformat(s)
@@ -33,32 +45,78 @@ class UserActivityService:
         self,
         query_name: str,
         date_from: Optional[str] = None,
-        date_to: Optional[str] = None
+        date_to: Optional[str] = None,
+        use_cache: bool = True,
+        incremental: Optional[bool] = None
     ) -> List[ActiveUsersResult]:
         
-        query = load_sql_file(self.sql_dir, query_name)
+        script = sql_registry.get(self.sql_dir, query_name)
 
         params = {
             "date_from": self._parse_date(date_from) if date_from else None,
             "date_to": self._parse_date(date_to) if date_to else None
         }
+        if incremental is None:
+            incremental = settings.REPORT_INCREMENTAL
 
-        activity_data: List[ActiveUsersResult] = []
+        if not use_cache:
+            return await self._execute(script, params, incremental)
+        key = ("activity", query_name, script.checksum, params["date_from"], params["date_to"], None)
+        return await report_cache.get_or_compute(key, lambda: self._execute(script, params, incremental))
 
+    async def _fetch_records(self, script: SQLScript, date_from: Optional[date], date_to: Optional[date]) -> List[dict]:
         async with self.session_factory() as session:
             try:
-                result = await session.execute(sqlalchemy.text(query), params)
+                result = await session.execute(script.statement, {"date_from": date_from, "date_to": date_to})
                 records = [dict(r) for r in result.mappings()]
-
-                logger.info(f"Executed query '{query_name}', returned {len(records)} rows")
-
-                for row in records:
-                    activity_data.append(ActiveUsersResult(
-                        date=row["date"],
-                        users=int(row["users"])
-                    ))
+                logger.info(f"Executed query '{script.name}', returned {len(records)} rows")
+                return records
             except Exception as e:
-                logger.error(f"Database error executing query '{query_name}': {e}")
+                logger.error(f"Database error executing query '{script.name}': {e}")
                 raise
 
-        return activity_data
+    async def _execute(self, script: SQLScript, params: dict, incremental: bool = False) -> List[ActiveUsersResult]:
+        if incremental and params["date_from"] and params["date_to"]:
+            # Сохраненные дни берутся из хранилища, запрашиваются только недостающие
+            records = await report_store.load_range(
+                "activity", script, params["date_from"], params["date_to"], partial(self._fetch_records, script)
+            )
+        else:
+            records = await self._fetch_records(script, params["date_from"], params["date_to"])
+
+        return [
+            ActiveUsersResult(date=row["date"], users=int(row["users"]))
+            for row in records
+        ]
+
+    def stream_active_users(
+        self,
+        query_name: str,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        batch_size: Optional[int] = None
+    ) -> AsyncIterator[List[ActiveUsersResult]]:
+        """
+        Выполнить запрос с серверным курсором и отдавать результат частями по batch_size строк.
+        Скрипт проверяется сразу (FileNotFoundError до начала ответа), запрос выполняется при итерации.
+        """
+        script = sql_registry.get(self.sql_dir, query_name)
+        params = {
+            "date_from": self._parse_date(date_from) if date_from else None,
+            "date_to": self._parse_date(date_to) if date_to else None
+        }
+        return self._stream(script, params, batch_size or settings.REPORT_STREAM_BATCH_SIZE)
+
+    async def _stream(self, script: SQLScript, params: dict, batch_size: int) -> AsyncIterator[List[ActiveUsersResult]]:
+        total = 0
+        try:
+            async with self.engine.connect() as conn:
+                result = await conn.stream(script.statement, params, execution_options={"yield_per": batch_size})
+                async for rows in result.mappings().partitions(batch_size):
+                    batch = [ActiveUsersResult(date=row["date"], users=int(row["users"])) for row in rows]
+                    total += len(batch)
+                    yield batch
+        except Exception as e:
+            logger.error(f"Database error streaming query '{script.name}': {e}")
+            raise
+        logger.info(f"Streamed query '{script.name}' with {total} records")
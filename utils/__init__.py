@@ -1,3 +1,3 @@
 # Utils package
 from utils.csv_processor import CSVProcessor, process_payment_csv
-from utils.category_mapper import CategoryMapper, map_category
+from utils.category_mapper import CategoryMapper, map_category, map_categories
@@ -0,0 +1,168 @@
+"""
+Cache invalidation events shared between worker processes.
+Общие для всех воркеров события сброса кэшей (через SQLite).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from core.config import settings
+from utils.sqlite_connections import local_connections
+
+logger = logging.getLogger(__name__)
+
+# Обработчик события: получает параметры, переданные в publish()
+EventHandler = Callable[[Dict[str, Any]], Any]
+
+
+class CacheEvents:
+    """
+    Append-only log of cache invalidations in a SQLite table.
+
+    In-memory caches are per worker process. An admin request handled by one
+    worker publishes an event; every worker (including the publisher) applies
+    events it has not seen yet through the registered handlers, at most once
+    per check interval on the request path. Only events published after the
+    process started are applied: a fresh process has nothing to invalidate.
+    """
+
+    def __init__(self, db_path: str = "data/cache_events.db", check_interval: float = 1,
+                 retention_days: int = 1):
+        """
+        Initialize the event log.
+
+        Args:
+            db_path: Path to the SQLite database file (shared by all workers)
+            check_interval: Minimum interval in seconds between checks for new events
+            retention_days: Events older than this are deleted on publish
+        """
+        self.db_path = db_path
+        self.check_interval = check_interval
+        self.retention_days = retention_days
+        self._connections = local_connections(db_path)
+        self._handlers: Dict[str, EventHandler] = {}
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._last_id = 0
+        self._init_db()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Получить соединение текущего потока"""
+        return self._connections.get()
+
+    def _init_db(self):
+        """Create the events table and skip the events published before this process started."""
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        try:
+            conn = self._get_connection()
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS cache_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            ''')
+            conn.commit()
+            self._last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM cache_events").fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error initializing cache events: {e}")
+            self._connections.close()
+
+    def register(self, name: str, handler: EventHandler):
+        """
+        Register the handler applying an event in this process.
+
+        Args:
+            name: Event name
+            handler: Function called with the event parameters
+        """
+        self._handlers[name] = handler
+
+    def publish(self, name: str, **params) -> Any:
+        """
+        Publish an event to all workers and apply it in this process right away.
+
+        Args:
+            name: Event name (a handler must be registered)
+            **params: JSON-serializable event parameters
+
+        Returns:
+            Result of the local handler
+        """
+        with self._lock:
+            # Сначала применяются чужие события, затем свое - в порядке публикации
+            self._apply_pending()
+            conn = self._get_connection()
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO cache_events (name, params, created_at) VALUES (?, ?, ?)",
+                    (name, json.dumps(params), datetime.now().isoformat())
+                )
+                conn.execute(
+                    "DELETE FROM cache_events WHERE created_at < ?",
+                    ((datetime.now() - timedelta(days=self.retention_days)).isoformat(),)
+                )
+            self._last_id = max(self._last_id, cursor.lastrowid)
+            self._checked_at = time.monotonic()
+        logger.info(f"Published cache event '{name}' {params}")
+        return self._handlers[name](params)
+
+    def poll(self):
+        """Apply new events of other workers (throttled to once per check interval)."""
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return
+            try:
+                self._apply_pending()
+            except Exception as e:
+                logger.error(f"Error reading cache events: {e}")
+                self._connections.close()
+            self._checked_at = time.monotonic()
+
+    def _apply_pending(self):
+        rows = self._get_connection().execute(
+            "SELECT id, name, params FROM cache_events WHERE id > ? ORDER BY id", (self._last_id,)
+        ).fetchall()
+        for event_id, name, params in rows:
+            self._last_id = event_id
+            handler: Optional[EventHandler] = self._handlers.get(name)
+            if handler is None:
+                logger.warning(f"No handler for cache event '{name}'")
+                continue
+            try:
+                handler(json.loads(params))
+                logger.info(f"Applied cache event '{name}' {params} from another worker")
+            except Exception as e:
+                logger.error(f"Error applying cache event '{name}': {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get event log state of this process.
+
+        Returns:
+            Dictionary with the last applied event id and registered handlers
+        """
+        return {
+            "last_event_id": self._last_id,
+            "check_interval": self.check_interval,
+            "handlers": sorted(self._handlers),
+        }
+
+
+# Общий журнал событий кэшей
+cache_events = CacheEvents(
+    db_path=settings.CACHE_EVENTS_PATH,
+    check_interval=settings.CACHE_EVENTS_CHECK_INTERVAL
+)
@@ -3,15 +3,34 @@ Module for mapping Article and Sub-Article fields to Categories.
 Модуль для преобразования полей Статья и Подстатья в Категорию.
 """
 import json
+import hashlib
 import logging
 import os
-from typing import Dict, Optional
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
 
 from core.config import settings
 
 logger = logging.getLogger(__name__)
 
 
+class MappingVersion(NamedTuple):
+    """
+    Immutable loaded version of the category mapping.
+    Неизменяемая загруженная версия маппинга категорий.
+    """
+    version: int
+    checksum: str
+    fingerprint: Optional[Tuple[int, int]]
+    mapping: Dict[str, Dict[str, str]]
+    lookup: Dict[Tuple[str, str], str]
+    loaded_at: float
+
+
 class CategoryMapper:
     """
     Class for mapping Article and Sub-Article fields to Categories
@@ -30,8 +49,50 @@ class CategoryMapper:
                               If None, uses the path from settings.
         """
         self.mapping_file_path = mapping_file_path or settings.CATEGORY_MAPPING_PATH
-        self.mapping: Dict[str, Dict[str, str]] = self._load_mapping()
-        
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._watcher_stop = threading.Event()
+        # Отпечаток файла, который не удалось загрузить: не перечитываем его повторно
+        self._failed_fingerprint: Optional[Tuple[int, int]] = None
+        fingerprint = self._fingerprint()
+        self._current: MappingVersion = self._compile(self._load_mapping(), fingerprint, version=1)
+
+    @property
+    def mapping(self) -> Dict[str, Dict[str, str]]:
+        """Article -> sub-article -> category mapping of the current version."""
+        return self._current.mapping
+
+    @property
+    def current_version(self) -> MappingVersion:
+        """Currently active mapping version."""
+        return self._current
+
+    def _fingerprint(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.mapping_file_path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    @staticmethod
+    def _compile(mapping: Dict[str, Dict[str, str]], fingerprint: Optional[Tuple[int, int]],
+                 version: int) -> MappingVersion:
+        """Build the flat (article, sub-article) -> category lookup for a mapping."""
+        lookup = {
+            (article, sub_article): category
+            for article, sub_articles in mapping.items() if isinstance(sub_articles, dict)
+            for sub_article, category in sub_articles.items()
+        }
+        checksum = hashlib.sha1(json.dumps(mapping, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+        return MappingVersion(version, checksum, fingerprint, mapping, lookup, time.time())
+
+    def _read_mapping(self) -> Dict[str, Dict[str, str]]:
+        with open(self.mapping_file_path, 'r', encoding='utf-8') as f:
+            mapping = json.load(f)
+        if not isinstance(mapping, dict):
+            raise ValueError("Category mapping must be a JSON object")
+        return mapping
+
     def _load_mapping(self) -> Dict[str, Dict[str, str]]:
         """
         Load the category mapping from the JSON file.
@@ -44,11 +105,10 @@ class CategoryMapper:
                 logger.warning(f"Category mapping file not found: {self.mapping_file_path}")
                 return {}
                 
-            with open(self.mapping_file_path, 'r', encoding='utf-8') as f:
-                mapping = json.load(f)
-                logger.info(f"Successfully loaded category mapping with {len(mapping)} articles")
-                return mapping
-        except (json.JSONDecodeError, IOError) as e:
+            mapping = self._read_mapping()
+            logger.info(f"Successfully loaded category mapping with {len(mapping)} articles")
+            return mapping
+        except (json.JSONDecodeError, ValueError, IOError) as e:
             logger.error(f"Error loading category mapping file: {e}")
             return {}
     
@@ -69,8 +129,9 @@ class CategoryMapper:
             
         # Try to find the mapping
         try:
-            if article in self.mapping and sub_article in self.mapping[article]:
-                return self.mapping[article][sub_article]
+            category = self._current.lookup.get((article, sub_article))
+            if category is not None:
+                return category
             else:
                 logger.warning(f"No mapping found for article '{article}' and sub-article '{sub_article}'")
                 return "Прочее"
@@ -78,19 +139,128 @@ class CategoryMapper:
             logger.error(f"Error mapping category for '{article}' and '{sub_article}': {e}")
             return "Прочее"
     
+    def map_categories(self, articles: pd.Series, sub_articles: pd.Series) -> Tuple[pd.Series, Dict[Tuple[str, str], int]]:
+        """
+        Map whole article and sub-article columns to categories at once.
+        
+        Every distinct (article, sub-article) pair is looked up in the mapping
+        exactly once and the result is broadcast back to the rows. Empty and
+        unmapped pairs are logged once per call as aggregated counts.
+        
+        Args:
+            articles: Article column
+            sub_articles: Sub-article column (aligned with articles)
+            
+        Returns:
+            Tuple of (category column, {(article, sub-article): row count} of unmapped and empty pairs)
+        """
+        article_codes, article_values = pd.factorize(articles.astype(str))
+        sub_article_codes, sub_article_values = pd.factorize(sub_articles.astype(str))
+        width = max(len(sub_article_values), 1)
+        pair_keys = article_codes.astype(np.int64) * width + sub_article_codes
+        codes, unique_keys = pd.factorize(pair_keys)
+        lookup = self._current.lookup
+        counts = np.bincount(codes, minlength=len(unique_keys))
+        
+        categories = np.empty(len(unique_keys), dtype=object)
+        unmapped: Dict[Tuple[str, str], int] = {}
+        empty_rows = empty_pairs = 0
+        for i, key in enumerate(unique_keys):
+            article = article_values[key // width]
+            sub_article = sub_article_values[key % width]
+            if not article or not sub_article:
+                categories[i] = "Не определено"
+                empty_rows += int(counts[i])
+                empty_pairs += 1
+                unmapped[(article, sub_article)] = int(counts[i])
+                continue
+            category = lookup.get((article, sub_article))
+            if category is None:
+                categories[i] = "Прочее"
+                unmapped[(article, sub_article)] = int(counts[i])
+            else:
+                categories[i] = category
+        
+        if unmapped:
+            unmapped_rows = sum(unmapped.values()) - empty_rows
+            top = sorted(unmapped.items(), key=lambda item: item[1], reverse=True)[:10]
+            logger.warning(
+                f"Category mapping: {empty_rows} rows with empty article or sub-article, "
+                f"{unmapped_rows} rows in {len(unmapped) - empty_pairs} unmapped pairs. "
+                f"Top pairs: {top}"
+            )
+        return pd.Series(categories[codes], index=articles.index, dtype=object), unmapped
+    
     def reload_mapping(self) -> bool:
         """
         Reload the category mapping from the file.
         
+        The new version is compiled aside and swapped in with a single
+        assignment; requests already running keep the version they started
+        with. If the file is missing, invalid or empty the current version stays active.
+        
         Returns:
             bool: True if reloading was successful, False otherwise
         """
-        try:
-            self.mapping = self._load_mapping()
-            return bool(self.mapping)
-        except Exception as e:
-            logger.error(f"Error reloading category mapping: {e}")
+        with self._reload_lock:
+            fingerprint = self._fingerprint()
+            try:
+                mapping = self._read_mapping()
+                # Пустой файл - скорее недописанный, чем намеренный: категории всех платежей пропали бы
+                if not mapping:
+                    raise ValueError("Category mapping is empty")
+            except Exception as e:
+                self._failed_fingerprint = fingerprint
+                logger.error(f"Error reloading category mapping, keeping version {self._current.version}: {e}")
+                return False
+            new_version = self._compile(mapping, fingerprint, version=self._current.version + 1)
+            self._current = new_version
+            logger.info(
+                f"Category mapping version {new_version.version} ({new_version.checksum}) loaded "
+                f"with {len(mapping)} articles"
+            )
+            return True
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reload the mapping if the file's mtime or size differs from the active version.
+        
+        Returns:
+            bool: True if a new version was loaded
+        """
+        fingerprint = self._fingerprint()
+        if fingerprint is None or fingerprint in (self._current.fingerprint, self._failed_fingerprint):
             return False
+        return self.reload_mapping()
+
+    def start_watcher(self, interval: float):
+        """
+        Start a daemon thread that checks the mapping file every interval seconds.
+        
+        Args:
+            interval: Seconds between file checks
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._watcher_stop.clear()
+
+        def watch():
+            while not self._watcher_stop.wait(interval):
+                try:
+                    self.reload_if_changed()
+                except Exception as e:
+                    logger.error(f"Category mapping watcher error: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="category-mapping-watcher", daemon=True)
+        self._watcher.start()
+        logger.info(f"Watching {self.mapping_file_path} for changes every {interval}s")
+
+    def stop_watcher(self):
+        """Stop the file watcher thread."""
+        self._watcher_stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
 
 
 # Create a singleton instance for easy import and use
@@ -109,3 +279,17 @@ def map_category(article: str, sub_article: str) -> str:
         str: Mapped category
     """
     return category_mapper.map_category(article, sub_article)
+
+
+def map_categories(articles: pd.Series, sub_articles: pd.Series) -> Tuple[pd.Series, Dict[Tuple[str, str], int]]:
+    """
+    Convenience function to map article and sub-article columns to categories.
+    
+    Args:
+        articles: Article column
+        sub_articles: Sub-article column
+        
+    Returns:
+        Tuple of category column and counts of unmapped pairs
+    """
+    return category_mapper.map_categories(articles, sub_articles)
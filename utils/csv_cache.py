@@ -0,0 +1,144 @@
+"""
+Process-wide cache of parsed CSV files.
+Кэш разобранных CSV-файлов на уровне процесса.
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from pandas import DataFrame
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ParsedCSVCache:
+    """
+    Memory-bounded LRU cache of parsed DataFrames.
+
+    Entries are keyed by absolute path plus loader variant and are valid only
+    while the file fingerprint (mtime, size) is unchanged. Cached frames are
+    shared between requests and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024, max_entries: int = 8):
+        """
+        Initialize the CSV cache.
+
+        Args:
+            max_bytes: Total memory budget for cached DataFrames
+            max_entries: Maximum number of cached files
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Tuple[Tuple[int, int], DataFrame, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Tuple, threading.Lock] = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(file_path: str) -> Tuple[int, int]:
+        """Return (mtime in ns, size) of a file."""
+        stat = os.stat(file_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _lookup(self, key: Tuple, fingerprint: Tuple[int, int]) -> Optional[DataFrame]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != fingerprint:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def get_or_load(self, file_path: str, loader: Callable[[], DataFrame],
+                    variant: Hashable = ()) -> DataFrame:
+        """
+        Get a parsed DataFrame from cache or load it with the given loader.
+
+        Concurrent requests for the same missing file wait for a single load.
+
+        Args:
+            file_path: Path to the source file
+            loader: Function that parses the file into a DataFrame
+            variant: Extra key part for loaders with different parameters
+
+        Returns:
+            Parsed DataFrame (shared, do not modify in place)
+        """
+        key = (os.path.abspath(file_path), variant)
+        fingerprint = self.fingerprint(file_path)
+        data = self._lookup(key, fingerprint)
+        if data is not None:
+            return data
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            data = self._lookup(key, fingerprint)
+            if data is not None:
+                return data
+            with self._lock:
+                self.misses += 1
+            data = loader()
+            self._store(key, fingerprint, data)
+            return data
+
+    def _store(self, key: Tuple, fingerprint: Tuple[int, int], data: DataFrame):
+        size = int(data.memory_usage(deep=True).sum())
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[2]
+            if size > self.max_bytes:
+                logger.warning(f"Parsed file {key[0]} ({size} bytes) exceeds CSV cache budget, not cached")
+                return
+            self._entries[key] = (fingerprint, data, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                evicted_key, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                logger.info(f"Evicted parsed file {evicted_key[0]} from CSV cache")
+        logger.info(f"Cached parsed file {key[0]}: {size} bytes")
+
+    def invalidate(self, file_path: Optional[str] = None):
+        """
+        Drop cached entries.
+
+        Args:
+            file_path: Drop only the entries of this file (all entries if None)
+        """
+        path = os.path.abspath(file_path) if file_path else None
+        with self._lock:
+            for key in [k for k in self._entries if path is None or k[0] == path]:
+                self.total_bytes -= self._entries.pop(key)[2]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with number of entries, memory usage, hits and misses
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Общий кэш для всех CSVProcessor процесса
+csv_cache = ParsedCSVCache(
+    max_bytes=settings.CSV_CACHE_MAX_BYTES,
+    max_entries=settings.CSV_CACHE_MAX_ENTRIES
+)
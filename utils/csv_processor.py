@@ -5,18 +5,27 @@ and preparing data for further processing.
 """
 
 import os
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterator, List, Optional, Union
 
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
 import logging
 
+from core.config import settings
+from utils.csv_cache import csv_cache
+from utils.csv_snapshot import load_snapshot, write_snapshot
+
 logger = logging.getLogger(__name__)
 
 
 class CSVProcessor:
     """Class for processing CSV files with payment data."""
 
+    # Текстовые столбцы платежей (в нижнем регистре): пропуски всегда заполняются ""
+    TEXT_COLUMNS = ["status", "статус", "currency", "валюта", "article", "статья",
+                    "sub_article", "sub-article", "подстатья"]
+
     def __init__(self, file_path: str):
         """
         Initialize the CSV processor with a file path.
@@ -26,14 +35,20 @@ class CSVProcessor:
         """
         self.file_path: str = file_path
         self._data: Optional[DataFrame] = None
+        # True, если _data уже очищены (дубликаты, пропуски, даты) и взяты из общего кэша
+        self._normalized: bool = False
         logger.info(f"CSVProcessor initialized with file: {self.file_path}")
 
-    def read_csv(self, encoding: str = 'utf-8', **kwargs) -> DataFrame:
+    def read_csv(self, encoding: str = 'utf-8', use_cache: bool = False, **kwargs) -> DataFrame:
         """
         Read CSV file and return DataFrame.
 
         Args:
             encoding: File encoding (default: utf-8)
+            use_cache: Take the parsed and normalized data from the process-wide
+                       cache (re-parsed only when the file changes, via a binary
+                       snapshot if CSV_SNAPSHOT_ENABLED). The returned DataFrame
+                       is shared and must not be modified in place.
             **kwargs: Additional arguments to pass to pandas.read_csv
 
         Returns:
@@ -48,14 +63,167 @@ class CSVProcessor:
             logger.error(f"File not found: {self.file_path}")
             raise FileNotFoundError(f"File not found: {self.file_path}")
 
-        try:
-            self._data = pd.read_csv(self.file_path, encoding=encoding, **kwargs)
-            logger.info(f"CSV file loaded: {self.file_path}, rows: {len(self._data)}")
+        if use_cache:
+            variant = (encoding, tuple(sorted(kwargs.items())))
+            self._data = csv_cache.get_or_load(
+                self.file_path,
+                lambda: self._load_normalized(variant, encoding, **kwargs),
+                variant=variant
+            )
+            self._normalized = True
             return self._data
+
+        self._data = self._read_file(encoding, **kwargs)
+        self._normalized = False
+        return self._data
+
+    def _load_normalized(self, variant: tuple, encoding: str, **kwargs) -> DataFrame:
+        """Load normalized data from a binary snapshot, or parse the CSV and write one."""
+        fingerprint = csv_cache.fingerprint(self.file_path)
+        if settings.CSV_SNAPSHOT_ENABLED:
+            data = load_snapshot(self.file_path, variant, fingerprint)
+            if data is not None:
+                return data
+
+        # Кэшированные данные отсортированы по дате для выборки диапазона двоичным поиском
+        data = self.sort_by_date(self.normalize(self._read_file(encoding, **kwargs)))
+        if settings.CSV_SNAPSHOT_ENABLED:
+            write_snapshot(self.file_path, variant, fingerprint, data)
+        return data
+
+    def _read_file(self, encoding: str, **kwargs) -> DataFrame:
+        try:
+            data = pd.read_csv(self.file_path, encoding=encoding, **kwargs)
+            logger.info(f"CSV file loaded: {self.file_path}, rows: {len(data)}")
+            return data
         except Exception as e:
             logger.error(f"Error reading CSV file {self.file_path}: {e}")
             raise type(e)(f"Error reading CSV file {self.file_path}: {str(e)}")
 
+    @staticmethod
+    def date_columns(data: DataFrame) -> List[str]:
+        """Return columns whose names look like dates or times."""
+        return [
+            col for col in data.columns
+            if any(date_keyword in col.lower() for date_keyword in ["date", "дата", "time", "время"])
+        ]
+
+    @classmethod
+    def normalize(cls, data: DataFrame, date_from: Optional[str] = None, date_to: Optional[str] = None) -> DataFrame:
+        """
+        Drop duplicates, fill missing values and convert date columns to datetime.
+
+        With date_from/date_to the rows are filtered by the first date column
+        before the other steps, so only the rows of the range are processed.
+        Identical rows have identical dates, so duplicates are dropped exactly
+        as without the filter.
+
+        Args:
+            data: Raw DataFrame
+            date_from: Keep only rows from this date (YYYY-MM-DD)
+            date_to: Keep only rows up to this date (YYYY-MM-DD)
+
+        Returns:
+            New normalized DataFrame
+        """
+        date_columns = cls.date_columns(data)
+        parsed = {}
+        if (date_from or date_to) and date_columns:
+            date_col = date_columns[0]
+            dates = cls._parse_dates(data[date_col])
+            if dates is not None:
+                mask = cls.date_mask(dates, date_from, date_to)
+                data = data[mask]
+                parsed[date_col] = dates[mask]
+
+        # Drop duplicates
+        data = data.drop_duplicates()
+
+        # Fill missing values (customize as needed). Text columns are filled by name:
+        # in a chunk where such a column is entirely empty pandas reads it as float
+        data = data.fillna({
+            col: "" if data[col].dtype == "object" or col.lower() in cls.TEXT_COLUMNS else 0
+            for col in data.columns
+        })
+
+        # Convert date columns to datetime
+        for col in date_columns:
+            if col in parsed:
+                data[col] = parsed[col].loc[data.index]
+                continue
+            dates = cls._parse_dates(data[col])
+            if dates is not None:
+                data[col] = dates
+        return data
+
+    @staticmethod
+    def _parse_dates(values: pd.Series) -> Optional[pd.Series]:
+        try:
+            return pd.to_datetime(values, errors='coerce', dayfirst=True)
+        except Exception as e:
+            logger.warning(f"Failed to parse dates in column {values.name}: {e}")
+            return None
+
+    @staticmethod
+    def date_mask(dates: pd.Series, date_from: Optional[str], date_to: Optional[str]) -> pd.Series:
+        """Boolean mask of dates within [date_from, date_to]."""
+        mask = pd.Series(True, index=dates.index)
+        if date_from:
+            mask &= dates >= pd.to_datetime(date_from)
+        if date_to:
+            mask &= dates <= pd.to_datetime(date_to)
+        return mask
+
+    @classmethod
+    def sort_by_date(cls, data: DataFrame) -> DataFrame:
+        """
+        Stable-sort normalized rows by the first date column (rows without a date go last),
+        then by the id column if there is one.
+
+        Data sorted this way can be filtered by date with date_range (binary search),
+        and rows of one date have a fixed (date, id) order for keyset pagination.
+        Non-numeric ids are ordered as strings (see id_sort_values).
+        """
+        date_columns = cls.date_columns(data)
+        if not date_columns or data[date_columns[0]].dtype != "datetime64[ns]":
+            return data
+        by = [date_columns[0]]
+        id_column = cls.id_column(data)
+        if id_column:
+            by.append(id_column)
+        return data.sort_values(
+            by, kind="mergesort", na_position="last",
+            key=lambda values: cls.id_sort_values(values) if values.name == id_column else values
+        )
+
+    @staticmethod
+    def id_column(data: DataFrame) -> Optional[str]:
+        """Return the id column name, if any."""
+        return next((col for col in data.columns if col.lower() == "id"), None)
+
+    @staticmethod
+    def id_sort_values(ids: pd.Series) -> pd.Series:
+        """Ids in their sort order: numeric ids as is, any other as strings."""
+        return ids if ids.dtype.kind in "iuf" else ids.astype(str)
+
+    @staticmethod
+    def date_range(data: DataFrame, date_col: str, date_from: Optional[str], date_to: Optional[str]) -> DataFrame:
+        """
+        Select rows within [date_from, date_to] from data sorted by date_col (see sort_by_date).
+
+        Two binary searches instead of comparing every row; the result is a
+        slice of the input.
+        """
+        values = data[date_col].to_numpy()
+        # NaT в конце отсортированного массива и больше любой даты для searchsorted,
+        # поэтому строки без даты в диапазон не попадают
+        start = values.searchsorted(pd.Timestamp(date_from).to_datetime64(), side="left") if date_from else 0
+        if date_to:
+            end = values.searchsorted(pd.Timestamp(date_to).to_datetime64(), side="right")
+        else:
+            end = values.searchsorted(np.datetime64("NaT"), side="left")
+        return data.iloc[start:end]
+
     def filter_by_status(self, status: str = "Оплачено") -> DataFrame:
         """
         Filter data by payment status.
@@ -98,6 +266,11 @@ class CSVProcessor:
         5. Фильтрует по статусу, если передан status
         6. Фильтрует по дате, если переданы date_from/date_to
 
+        The date filter runs first, so the other steps only process rows of
+        the range. Steps 1-3 are skipped for data read with
+        read_csv(use_cache=True), which is already normalized and sorted by
+        date once per file version; its date range is taken by binary search.
+
         Args:
             required_columns: List of columns to keep in the result
             status: Payment status to filter by (если None — не фильтровать)
@@ -114,52 +287,79 @@ class CSVProcessor:
             logger.error("Data not loaded. Call read_csv() first.")
             raise ValueError("Data not loaded. Call read_csv() first.")
 
-        # Make a copy to avoid modifying the original data with filtered data
-        processed_data: DataFrame = self._data.copy()
+        processed_data = self._prepare(self._data, self._normalized, required_columns, status, date_from, date_to)
+
+        # Never hand out the (possibly shared) source frame itself or a slice of it:
+        # cached data without a status filter is returned as is or as a date range slice,
+        # while normalize() and the status filter always build a new frame
+        if self._normalized and status is None:
+            processed_data = processed_data.copy()
+        return processed_data
+
+    def iter_prepared_chunks(self, chunksize: int, required_columns: Optional[List[str]] = None,
+                             status: Optional[str] = None, date_from: Optional[str] = None,
+                             date_to: Optional[str] = None, encoding: str = 'utf-8', **kwargs) -> Iterator[DataFrame]:
+        """
+        Read the CSV file in chunks and prepare every chunk like prepare_data().
+
+        Only one chunk is held in memory at a time. Duplicates are dropped
+        within a chunk only.
+
+        Args:
+            chunksize: Number of CSV rows per chunk
+            required_columns: List of columns to keep in the result
+            status: Payment status to filter by (если None — не фильтровать)
+            date_from: Start date (YYYY-MM-DD) for filtering
+            date_to: End date (YYYY-MM-DD) for filtering
+            encoding: File encoding (default: utf-8)
+            **kwargs: Additional arguments to pass to pandas.read_csv
+
+        Yields:
+            Prepared DataFrame of every chunk
+
+        Raises:
+            FileNotFoundError: If the file doesn't exist
+        """
+        if not os.path.exists(self.file_path):
+            logger.error(f"File not found: {self.file_path}")
+            raise FileNotFoundError(f"File not found: {self.file_path}")
+
+        with pd.read_csv(self.file_path, encoding=encoding, chunksize=chunksize, **kwargs) as reader:
+            for chunk in reader:
+                yield self._prepare(chunk, False, required_columns, status, date_from, date_to)
+
+    def _prepare(self, processed_data: DataFrame, normalized: bool, required_columns: Optional[List[str]],
+                 status: Optional[str], date_from: Optional[str], date_to: Optional[str]) -> DataFrame:
+        # Фильтрация по дате - первой, чтобы остальные шаги обрабатывали только строки диапазона.
+        # Данные из кэша очищены и отсортированы по дате: диапазон берется двоичным поиском
+        date_columns = self.date_columns(processed_data)
+        if normalized and (date_from or date_to) and date_columns:
+            date_col = date_columns[0]
+            if processed_data[date_col].dtype == "datetime64[ns]":
+                processed_data = self.date_range(processed_data, date_col, date_from, date_to)
+            else:
+                processed_data = processed_data[self.date_mask(processed_data[date_col], date_from, date_to)]
 
         if status is not None:
             status_columns = ["status", "статус", "Status", "Статус"]
             for col in status_columns:
                 if col in processed_data.columns:
-                    processed_data = processed_data[processed_data[col] == status].copy()
+                    processed_data = processed_data[processed_data[col] == status]
                     break
             else:
                 logger.error(f"Status column not found in CSV. Available columns: {', '.join(processed_data.columns)}")
                 raise KeyError(f"Status column not found in CSV. Available columns: {', '.join(processed_data.columns)}")
-        
-        # Drop duplicates
-        processed_data = processed_data.drop_duplicates()
-        
-        # Fill missing values (customize as needed)
-        processed_data = processed_data.fillna({
-            col: "" if processed_data[col].dtype == "object" else 0
-            for col in processed_data.columns
-        })
-        
-        # Convert date columns to datetime
-        date_columns = [
-            col for col in processed_data.columns
-            if any(date_keyword in col.lower() for date_keyword in ["date", "дата", "time", "время"])
-        ]
-        for col in date_columns:
-            try:
-                processed_data[col] = pd.to_datetime(processed_data[col], errors='coerce', dayfirst=True)
-            except Exception as e:
-                logger.warning(f"Failed to parse dates in column {col}: {e}")
-        # Фильтрация по дате
-        if (date_from or date_to) and date_columns:
-            date_col = date_columns[0]
-            if date_from:
-                processed_data = processed_data[processed_data[date_col] >= pd.to_datetime(date_from)]
-            if date_to:
-                processed_data = processed_data[processed_data[date_col] <= pd.to_datetime(date_to)]
+
+        # Иначе - дубликаты, пропуски и даты (с фильтром по дате до остальных шагов)
+        if not normalized:
+            processed_data = self.normalize(processed_data, date_from, date_to)
+
         if required_columns:
             available_columns = [col for col in required_columns if col in processed_data.columns]
             if not available_columns:
                 logger.error(f"None of the required columns {required_columns} found in data")
                 raise ValueError(f"None of the required columns {required_columns} found in data")
             processed_data = processed_data[available_columns]
-        
         return processed_data
 
     def get_summary(self) -> Dict:
@@ -0,0 +1,160 @@
+"""
+Binary snapshots of normalized CSV data for memory-mapped loading.
+Бинарные снимки нормализованных CSV-данных для загрузки через memory mapping.
+
+A snapshot is a directory with one .npy file per column plus meta.json.
+Numeric and datetime columns are stored as raw NumPy arrays and loaded with
+mmap_mode='r', so their pages are shared between worker processes. String
+columns are dictionary-encoded: categorical codes in .npy and the distinct
+values in meta.json. They are loaded as pandas Categoricals whose codes stay
+memory-mapped, so only the small dictionary is materialized per process.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+from typing import Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 4
+
+
+def _snapshot_prefix(file_path: str, variant: Hashable) -> str:
+    digest = hashlib.sha1(f"{os.path.abspath(file_path)}|{variant!r}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(settings.CSV_SNAPSHOT_DIR, digest)
+
+
+def _snapshot_dir(file_path: str, variant: Hashable, fingerprint: Tuple[int, int]) -> str:
+    # Отпечаток файла входит в имя каталога: изменение CSV сразу делает старый снимок невидимым
+    return f"{_snapshot_prefix(file_path, variant)}-{fingerprint[0]}-{fingerprint[1]}"
+
+
+def load_snapshot(file_path: str, variant: Hashable, fingerprint: Tuple[int, int]) -> Optional[DataFrame]:
+    """
+    Load a snapshot of a CSV file if one exists for its current version.
+
+    Args:
+        file_path: Path to the source CSV file
+        variant: Loader parameters the snapshot was built with
+        fingerprint: (mtime in ns, size) of the source file
+
+    Returns:
+        DataFrame backed by memory-mapped arrays (read-only), or None if there is no valid snapshot
+    """
+    path = _snapshot_dir(file_path, variant, fingerprint)
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != SNAPSHOT_VERSION:
+            return None
+
+        columns = {}
+        for i, column in enumerate(meta["columns"]):
+            values = np.load(os.path.join(path, f"{i}.npy"), mmap_mode="r")
+            if column["kind"] == "strings":
+                values = pd.Categorical.from_codes(values, column["values"], validate=False)
+            elif column["kind"] == "datetime":
+                values = values.view(column["dtype"])
+            columns[column["name"]] = values
+        index = pd.Index(np.load(os.path.join(path, "index.npy"), mmap_mode="r"))
+        data = pd.DataFrame(columns, index=index, copy=False)
+        logger.info(f"Loaded snapshot of {file_path}: {len(data)} rows")
+        return data
+    except Exception as e:
+        logger.warning(f"Failed to load snapshot {path}: {e}")
+        return None
+
+
+def write_snapshot(file_path: str, variant: Hashable, fingerprint: Tuple[int, int], data: DataFrame) -> bool:
+    """
+    Write a snapshot of normalized CSV data and remove snapshots of older file versions.
+
+    The snapshot is written to a temporary directory and renamed into place,
+    so concurrent readers and writers never see a partial snapshot.
+
+    Args:
+        file_path: Path to the source CSV file
+        variant: Loader parameters the data was built with
+        fingerprint: (mtime in ns, size) of the source file the data was read from
+        data: Normalized DataFrame
+
+    Returns:
+        True if the snapshot was written
+    """
+    path = _snapshot_dir(file_path, variant, fingerprint)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(tmp_path, exist_ok=True)
+        columns = []
+        for i, name in enumerate(data.columns):
+            series = data[name]
+            column = {"name": name, "dtype": str(series.dtype)}
+            if pd.api.types.is_datetime64_ns_dtype(series.dtype) and series.dt.tz is None:
+                column["kind"] = "datetime"
+                values = series.to_numpy().view("int64")
+            elif series.dtype.kind in "biuf":
+                column["kind"] = "numeric"
+                values = series.to_numpy()
+            elif series.dtype == object:
+                try:
+                    # Отсортированный словарь: группировка по категориям идет в том же порядке, что и по строкам
+                    categorical = pd.Categorical(series)
+                except TypeError:
+                    # Несравнимые значения разных типов: словарь в порядке появления
+                    categorical = pd.Categorical.from_codes(*pd.factorize(series))
+                column["kind"] = "strings"
+                column["values"] = [v.item() if isinstance(v, np.generic) else v for v in categorical.categories]
+                # Коды в минимальном типе pandas (-1 для NaN): from_codes при загрузке не копирует массив
+                values = categorical.codes
+            else:
+                logger.info(f"Snapshot of {file_path} skipped: unsupported dtype {series.dtype} in column {name}")
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                return False
+            np.save(os.path.join(tmp_path, f"{i}.npy"), values)
+            columns.append(column)
+        np.save(os.path.join(tmp_path, "index.npy"), data.index.to_numpy())
+
+        with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "version": SNAPSHOT_VERSION,
+                "source": os.path.abspath(file_path),
+                "fingerprint": list(fingerprint),
+                "rows": len(data),
+                "columns": columns
+            }, f, ensure_ascii=False)
+
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # Снимок уже записан другим процессом
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return False
+    except Exception as e:
+        logger.warning(f"Failed to write snapshot of {file_path}: {e}")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        return False
+
+    _remove_stale_snapshots(file_path, variant, path)
+    logger.info(f"Wrote snapshot of {file_path} to {path}")
+    return True
+
+
+def _remove_stale_snapshots(file_path: str, variant: Hashable, current_path: str):
+    prefix = os.path.basename(_snapshot_prefix(file_path, variant))
+    for name in os.listdir(settings.CSV_SNAPSHOT_DIR):
+        path = os.path.join(settings.CSV_SNAPSHOT_DIR, name)
+        if name.startswith(prefix + "-") and path != current_path and not name.endswith(".tmp"):
+            shutil.rmtree(path, ignore_errors=True)
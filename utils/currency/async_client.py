@@ -0,0 +1,138 @@
+"""
+Asynchronous client for fetching currency exchange rates from external API.
+Асинхронный клиент для получения курсов валют из внешнего API.
+"""
+
+import asyncio
+import logging
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+from core.config import settings
+from utils.currency.client import CurrencyClient
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class AsyncCurrencyClient:
+    """
+    Non-blocking client for the exchange rate API.
+
+    Uses a pooled httpx.AsyncClient with timeouts and retries. Concurrent
+    requests for the same (base currency, effective date) are coalesced
+    into a single in-flight fetch.
+    """
+
+    BASE_URL = CurrencyClient.BASE_URL
+
+    def __init__(self, max_connections: int = 10, timeout: float = 10.0,
+                 retries: int = 2, backoff: float = 0.5):
+        """
+        Initialize the async currency client.
+
+        Args:
+            max_connections: Size of the HTTP connection pool
+            timeout: Request timeout in seconds
+            retries: Number of retries on network errors and 429/5xx responses
+            backoff: Base delay in seconds between retries (doubles every attempt)
+        """
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._in_flight: Dict[Tuple[str, date], asyncio.Future] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Получить HTTP-клиент текущего event loop или создать новый"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                timeout=httpx.Timeout(self.timeout)
+            )
+            self._loop = loop
+            self._in_flight = {}
+        return self._client
+
+    async def get_exchange_rates(self, base_currency: str, request_date: Optional[date]) -> Dict[str, float]:
+        """
+        Fetch exchange rates from the API, sharing one request between concurrent callers.
+
+        Args:
+            base_currency: Base currency code (e.g., 'usd', 'eur')
+            request_date: Date for which to get exchange rates
+
+        Returns:
+            Dictionary with currency codes as keys and exchange rates as values
+
+        Raises:
+            ValueError: If the API request fails
+        """
+        if not base_currency:
+            raise ValueError("Base currency must be provided for client request")
+
+        self._get_client()
+        key = (base_currency.lower(), CurrencyClient.effective_date(request_date))
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(*key))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # shield: отмена одного из ожидающих не отменяет общий запрос
+        return await asyncio.shield(task)
+
+    async def _fetch(self, base_currency: str, effective_date: date) -> Dict[str, float]:
+        url = self.BASE_URL.format(date=effective_date.strftime("%Y-%m-%d"), base=base_currency)
+        client = self._get_client()
+
+        for attempt in range(self.retries + 1):
+            try:
+                response = await client.get(url)
+                if response.status_code in RETRY_STATUS_CODES and attempt < self.retries:
+                    raise httpx.HTTPStatusError(
+                        f"Retryable status {response.status_code}", request=response.request, response=response
+                    )
+                response.raise_for_status()
+                data = response.json()
+                break
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = isinstance(e, httpx.TransportError) or e.response.status_code in RETRY_STATUS_CODES
+                if not retryable or attempt >= self.retries:
+                    logger.error(f"Error fetching exchange rates: {e}")
+                    raise ValueError(f"Failed to fetch exchange rates: {str(e)}")
+                delay = self.backoff * (2 ** attempt)
+                logger.warning(f"Retrying exchange rates request {url} in {delay}s: {e}")
+                await asyncio.sleep(delay)
+            except ValueError as e:
+                logger.error(f"Error parsing exchange rates: {e}")
+                raise ValueError(f"Failed to parse exchange rates: {str(e)}")
+
+        # The API returns data in format {base_currency: {currency_code: rate, ...}}
+        if base_currency in data:
+            return data[base_currency]
+        logger.error(f"Unexpected API response format: {data}")
+        raise ValueError("Unexpected API response format")
+
+    async def aclose(self):
+        """Close the underlying connection pool."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+
+
+# Общий пул соединений к API курсов валют для всего процесса
+async_currency_client = AsyncCurrencyClient(
+    max_connections=settings.EXCHANGE_RATE_MAX_CONNECTIONS,
+    timeout=settings.EXCHANGE_RATE_TIMEOUT,
+    retries=settings.EXCHANGE_RATE_RETRIES
+)
@@ -4,137 +4,201 @@ SQLite кэш для курсов валют.
 """
 
 import os
-import json
 import sqlite3
 import logging
 from datetime import datetime, date, timedelta
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterable, Optional, Tuple
+
+from utils.sqlite_connections import local_connections
+from utils.currency.client import CurrencyClient
 
 logger = logging.getLogger(__name__)
 
 class CurrencyCache:
-    """SQLite cache for currency exchange rates."""
-    
+    """
+    SQLite cache for currency exchange rates.
+
+    Rates are stored normalized, one row per (base, quote, date), in a
+    WITHOUT ROWID table whose primary key (base_currency, date, quote_currency)
+    covers both single-day lookups and date range scans.
+
+    Connections are per thread and per process and shared by all instances
+    with the same db_path, so the cache is safe to use from threadpool
+    threads and from several worker processes at once.
+    """
+
     def __init__(self, db_path: str = "data/exchange_rates.db"):
         """
         Initialize the currency cache.
-        
+
         Args:
             db_path: Path to the SQLite database file
         """
         self.db_path = db_path
-        self.connection = None
-        self._init_db()
-        self._get_connection()
-            
+        self._connections = local_connections(db_path)
+        if not self._connections.initialized:
+            self._init_db()
+
     def _get_connection(self) -> sqlite3.Connection:
-        """Получить активное соединение или создать новое"""
-        if self.connection is None:
-            self.connection = sqlite3.connect(self.db_path)
-            self.connection.row_factory = sqlite3.Row
-        return self.connection
-    
+        """Получить соединение текущего потока"""
+        return self._connections.get()
+
+    @staticmethod
+    def _date_key(request_date: Optional[date]) -> str:
+        # Строки хранятся по дате, за которую API реально отдает курсы (как и в кэше в памяти),
+        # иначе запросы за разные даты с одной таблицей курсов дублируют строки
+        return CurrencyClient.effective_date(request_date).strftime("%Y-%m-%d")
+
     def _init_db(self):
         """Initialize the database for caching exchange rates."""
         db_dir = os.path.dirname(self.db_path)
         if db_dir:
             os.makedirs(db_dir, exist_ok=True)
-            
+
         try:
             conn = self._get_connection()
-            
+
             # Создаем таблицу, если её нет
             conn.execute('''
-                CREATE TABLE IF NOT EXISTS currency_rates (
-                    base_currency TEXT,
-                    date TEXT,
-                    rates TEXT,
-                    timestamp TEXT,
-                    PRIMARY KEY (base_currency, date)
-                )
+                CREATE TABLE IF NOT EXISTS exchange_rates (
+                    base_currency TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    quote_currency TEXT NOT NULL,
+                    rate REAL NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    PRIMARY KEY (base_currency, date, quote_currency)
+                ) WITHOUT ROWID
+            ''')
+            # Покрывающий индекс для выборки одной пары валют по диапазону дат
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_exchange_rates_pair
+                ON exchange_rates (base_currency, quote_currency, date, rate)
             ''')
             conn.commit()
-            
-            # Проверяем, что таблица создана
-            cursor = conn.execute("""
-                SELECT name FROM sqlite_master WHERE type='table' AND name='currency_rates';
-            """)
-            if cursor.fetchone():
-                logger.info("Table 'currency_rates' exists in DB.")
-            else:
-                logger.warning("Failed to create currency_rates table!")
-                
+            self._migrate_legacy_table(conn)
+            self._connections.initialized = True
+            logger.info("Table 'exchange_rates' exists in DB.")
+
         except Exception as e:
             logger.error(f"Error initializing database: {e}")
-            if self.connection:
-                self.connection.close()
-                self.connection = None
-    
-    def get_cached_rates(self, base_currency: str, 
+            self._connections.close()
+
+    def _migrate_legacy_table(self, conn: sqlite3.Connection):
+        """Move rows from the old JSON 'currency_rates' table into 'exchange_rates'."""
+        cursor = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='currency_rates'"
+        )
+        if not cursor.fetchone():
+            return
+        with conn:
+            conn.execute('''
+                INSERT OR IGNORE INTO exchange_rates (base_currency, date, quote_currency, rate, timestamp)
+                SELECT c.base_currency, c.date, j.key, j.value, c.timestamp
+                FROM currency_rates c, json_each(c.rates) j
+                WHERE j.type IN ('integer', 'real')
+            ''')
+            conn.execute("DROP TABLE currency_rates")
+        logger.info("Migrated legacy 'currency_rates' table to 'exchange_rates'")
+
+    def _handle_error(self, message: str, e: Exception):
+        logger.error(f"{message}: {e}")
+        self._connections.close()
+
+    def get_cached_rates(self, base_currency: str,
                          request_date: date) -> Optional[Dict[str, float]]:
         """
         Get exchange rates from cache.
-        
+
         Args:
             base_currency: Base currency code (e.g., 'usd', 'eur')
             request_date: Date for which to get exchange rates
-            
+
         Returns:
             Dictionary with currency codes as keys and exchange rates as values,
             or None if the cache is expired or doesn't exist
         """
-        date_str = request_date.strftime("%Y-%m-%d")
-        
         try:
             conn = self._get_connection()
             cursor = conn.execute(
-                "SELECT rates FROM currency_rates WHERE base_currency = ? AND date = ?",
-                (base_currency.lower(), date_str)
+                "SELECT quote_currency, rate FROM exchange_rates WHERE base_currency = ? AND date = ?",
+                (base_currency.lower(), self._date_key(request_date))
             )
-            row = cursor.fetchone()
-            
-            if row:
-                rates = json.loads(row['rates'])
-                return rates
-            
-            return None
+            rates = {row[0]: row[1] for row in cursor}
+            return rates or None
         except Exception as e:
-            logger.error(f"Error retrieving cached rates: {e}")
-            if self.connection:
-                self.connection.close()
-                self.connection = None
+            self._handle_error("Error retrieving cached rates", e)
             return None
-    
-    def cache_rates(self, base_currency: str, rates: Dict[str, float], 
+
+    def get_rates_range(self, base_currency: str, date_from: date,
+                        date_to: date) -> Dict[date, Dict[str, float]]:
+        """
+        Get all cached exchange rates for a base currency in a date range with one query.
+
+        Args:
+            base_currency: Base currency code (e.g., 'usd', 'eur')
+            date_from: First date of the range (inclusive)
+            date_to: Last date of the range (inclusive)
+
+        Returns:
+            Dictionary {date: {currency code: rate}} for the cached dates only
+        """
+        result: Dict[date, Dict[str, float]] = {}
+        try:
+            conn = self._get_connection()
+            cursor = conn.execute(
+                """
+                SELECT date, quote_currency, rate FROM exchange_rates
+                WHERE base_currency = ? AND date BETWEEN ? AND ?
+                """,
+                (base_currency.lower(), self._date_key(date_from), self._date_key(date_to))
+            )
+            for date_str, quote, rate in cursor:
+                result.setdefault(date.fromisoformat(date_str), {})[quote] = rate
+        except Exception as e:
+            self._handle_error("Error retrieving cached rates range", e)
+        return result
+
+    def cache_rates(self, base_currency: str, rates: Dict[str, float],
                    request_date: date = None):
         """
         Save exchange rates to cache.
-        
+
         Args:
             base_currency: Base currency code (e.g., 'usd', 'eur')
             rates: Dictionary with currency codes as keys and exchange rates as values
             request_date: Date for which the rates are valid
         """
-        date_str = request_date.strftime("%Y-%m-%d")
-        
+        self.cache_rates_bulk([(base_currency, request_date, rates)])
+
+    def cache_rates_bulk(self, items: Iterable[Tuple[str, Optional[date], Dict[str, float]]]):
+        """
+        Save many rate tables to cache in a single transaction.
+
+        Args:
+            items: Iterable of (base currency, date, {currency code: rate}) tuples
+        """
+        timestamp = datetime.now().isoformat()
+        rows = [
+            (base_currency.lower(), self._date_key(request_date), quote.lower(), float(rate), timestamp)
+            for base_currency, request_date, rates in items
+            for quote, rate in rates.items()
+            if isinstance(rate, (int, float))
+        ]
+        if not rows:
+            return
+
         try:
             conn = self._get_connection()
-            conn.execute(
-                """
-                INSERT OR REPLACE INTO currency_rates (base_currency, date, rates, timestamp)
-                VALUES (?, ?, ?, ?)
-                """,
-                (
-                    base_currency.lower(),
-                    date_str,
-                    json.dumps(rates),
-                    datetime.now().isoformat()
+            with conn:
+                conn.executemany(
+                    """
+                    INSERT INTO exchange_rates (base_currency, date, quote_currency, rate, timestamp)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (base_currency, date, quote_currency)
+                    DO UPDATE SET rate = excluded.rate, timestamp = excluded.timestamp
+                    """,
+                    rows
                 )
-            )
-            conn.commit()
-            logger.debug(f"Cached rates for {base_currency} on {date_str}")
+            logger.debug(f"Cached {len(rows)} rates")
         except Exception as e:
-            logger.error(f"Error caching rates: {e}")
-            if self.connection:
-                self.connection.close()
-                self.connection = None
+            self._handle_error("Error caching rates", e)
@@ -32,21 +32,28 @@ class CurrencyClient:
         Returns:
             URL for the API request
         """
-        # If no date is provided or the date is after the latest available date,
-        # use the latest available date
-        if request_date is None:
-            date_str = self.LATEST_AVAILABLE_DATE.strftime("%Y-%m-%d")
-        else:
-            # Привести request_date к типу date, если это pandas.Timestamp
-            if hasattr(request_date, 'date'):
-                request_date_cmp = request_date.date()
-            else:
-                request_date_cmp = request_date
-            if request_date_cmp < self.LATEST_AVAILABLE_DATE:
-                date_str = self.LATEST_AVAILABLE_DATE.strftime("%Y-%m-%d")
-            else:
-                date_str = request_date.strftime("%Y-%m-%d")
+        date_str = self.effective_date(request_date).strftime("%Y-%m-%d")
         return self.BASE_URL.format(date=date_str, base=base_currency.lower())
+
+    @classmethod
+    def effective_date(cls, request_date: Optional[date] = None) -> date:
+        """
+        Get the date the API will actually return rates for.
+
+        Args:
+            request_date: Date for which to get exchange rates
+
+        Returns:
+            LATEST_AVAILABLE_DATE for missing or earlier dates, otherwise the request date
+        """
+        if request_date is None:
+            return cls.LATEST_AVAILABLE_DATE
+        # Привести request_date к типу date, если это pandas.Timestamp
+        if isinstance(request_date, datetime):
+            request_date = request_date.date()
+        if request_date < cls.LATEST_AVAILABLE_DATE:
+            return cls.LATEST_AVAILABLE_DATE
+        return request_date
     
     def get_exchange_rates(self, base_currency: str, request_date: date) -> Dict[str, float]:
         """
@@ -68,7 +75,7 @@ class CurrencyClient:
         url = self._get_api_url(base_currency, request_date)
         
         try:
-            response = self.session.get(url)
+            response = self.session.get(url, timeout=settings.EXCHANGE_RATE_TIMEOUT)
             response.raise_for_status()
             
             data = response.json()
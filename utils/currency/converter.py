@@ -3,31 +3,53 @@ Currency converter for converting amounts between different currencies.
 Конвертер валют для конвертации сумм между различными валютами.
 """
 
+import asyncio
 import logging
-from datetime import date
-from typing import Dict, Optional, Union, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional, Union, List, Tuple
+
+import numpy as np
+import pandas as pd
 
 from core.config import settings
 from utils.currency.client import CurrencyClient
+from utils.currency.async_client import AsyncCurrencyClient, async_currency_client
 from utils.currency.cache import CurrencyCache
+from utils.currency.memory_cache import RateMemoryCache, rate_memory_cache
 from utils.currency.constants import Currency, ConversionResult
 
 logger = logging.getLogger(__name__)
 
+
+def date_range(date_from: date, date_to: date) -> List[date]:
+    """Return every date from date_from to date_to inclusive."""
+    return [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+
+
 class CurrencyConverter:
     """Currency converter for converting amounts between different currencies."""
     
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, memory_cache: Optional[RateMemoryCache] = None,
+                 async_client: Optional[AsyncCurrencyClient] = None, triangulate: Optional[bool] = None):
         """
         Initialize the currency converter.
         
         Args:
             db_path: Path to the SQLite database file
+            memory_cache: In-memory rate cache (defaults to the process-wide one)
+            async_client: Async API client (defaults to the process-wide pooled one)
+            triangulate: Derive every pair from the CURRENCY_PIVOT table instead of
+                         fetching a table per target currency (defaults to CURRENCY_TRIANGULATION)
         """
         if db_path is None:
             db_path = settings.SQLITE_DB_PATH
+        self.triangulate = settings.CURRENCY_TRIANGULATION if triangulate is None else triangulate
+        self.pivot = settings.CURRENCY_PIVOT.lower()
         self.client = CurrencyClient()
+        self.async_client = async_client or async_currency_client
         self.cache = CurrencyCache(db_path)
+        self.memory_cache = memory_cache or rate_memory_cache
     
     def get_exchange_rates(self, base_currency: Union[Currency, str] = Currency.USD,
                           request_date: Optional[date] = None) -> Dict[str, float]:
@@ -46,10 +68,16 @@ class CurrencyConverter:
         else:
             base_currency = base_currency.lower()
         
-        # Try to get rates from cache
+        # Try to get rates from memory, then from SQLite cache
+        effective_date = self.client.effective_date(request_date)
+        memory_rates = self.memory_cache.get(base_currency, effective_date)
+        if memory_rates:
+            return memory_rates
+
         cached_rates = self.cache.get_cached_rates(base_currency, request_date)
         
         if cached_rates:
+            self.memory_cache.put(base_currency, effective_date, cached_rates)
             return cached_rates
         
         # If cache is expired or doesn't exist, fetch new rates
@@ -58,9 +86,186 @@ class CurrencyConverter:
         
         # Save to cache
         self.cache.cache_rates(base_currency, rates, request_date)
+        self.memory_cache.put(base_currency, effective_date, rates)
+        
+        return rates
+    
+    async def aget_exchange_rates(self, base_currency: Union[Currency, str] = Currency.USD,
+                                  request_date: Optional[date] = None) -> Dict[str, float]:
+        """
+        Get exchange rates with caching without blocking the event loop.
+        
+        Same lookup order as get_exchange_rates(), but cache misses are fetched
+        through the pooled async client.
+        
+        Args:
+            base_currency: Base currency code (e.g., Currency.USD, Currency.EUR)
+            request_date: Date for which to get exchange rates
+            
+        Returns:
+            Dictionary with currency codes as keys and exchange rates as values
+        """
+        if isinstance(base_currency, Currency):
+            base_currency = base_currency.value.lower()
+        else:
+            base_currency = base_currency.lower()
+        
+        effective_date = self.client.effective_date(request_date)
+        memory_rates = self.memory_cache.get(base_currency, effective_date)
+        if memory_rates:
+            return memory_rates
+
+        # Запросы SQLite синхронные: выполняются в потоке, чтобы не блокировать event loop
+        cached_rates = await asyncio.to_thread(self.cache.get_cached_rates, base_currency, request_date)
+        if cached_rates:
+            self.memory_cache.put(base_currency, effective_date, cached_rates)
+            return cached_rates
+        
+        logger.info(f"Fetching new rates for {base_currency} on {request_date or 'latest'}")
+        rates = await self.async_client.get_exchange_rates(base_currency, request_date)
+        
+        await asyncio.to_thread(self.cache.cache_rates, base_currency, rates, request_date)
+        self.memory_cache.put(base_currency, effective_date, rates)
         
         return rates
     
+    def warm_rates(self, base_currency: Union[Currency, str], date_from: date, date_to: date) -> int:
+        """
+        Load all cached rate tables of a date range into memory with a single SQLite query.
+        
+        Args:
+            base_currency: Base currency code
+            date_from: First date of the range (inclusive)
+            date_to: Last date of the range (inclusive)
+            
+        Returns:
+            Number of rate tables loaded into memory
+        """
+        if isinstance(base_currency, Currency):
+            base_currency = base_currency.value
+        base_currency = base_currency.lower()
+        
+        tables = self.cache.get_rates_range(base_currency, date_from, date_to)
+        for day, rates in tables.items():
+            self.memory_cache.put(base_currency, self.client.effective_date(day), rates)
+        logger.info(f"Warmed {len(tables)} rate tables for {base_currency} from {date_from} to {date_to}")
+        return len(tables)
+    
+    def _plan_prefetch(self, bases: Iterable[Union[Currency, str]],
+                       dates: Iterable[date]) -> List[Tuple[str, date]]:
+        """Warm memory from SQLite and return the (base, effective date) pairs still missing."""
+        effective_dates = sorted({self.client.effective_date(d) for d in dates})
+        if not effective_dates:
+            return []
+        missing: List[Tuple[str, date]] = []
+        for base in {self.rate_base(b) for b in bases}:
+            self.warm_rates(base, effective_dates[0], effective_dates[-1])
+            missing.extend((base, d) for d in effective_dates if not self.memory_cache.contains(base, d))
+        return missing
+
+    def _store_prefetched(self, fetched: List[Tuple[str, date, Dict[str, float]]]):
+        """Save prefetched rate tables to SQLite in one transaction and to memory."""
+        self.cache.cache_rates_bulk(fetched)
+        for base, day, rates in fetched:
+            self.memory_cache.put(base, day, rates)
+
+    def prefetch_dates(self, bases: Iterable[Union[Currency, str]], dates: Iterable[date],
+                       max_workers: Optional[int] = None) -> int:
+        """
+        Make sure rate tables for every base and date are cached, fetching the missing ones concurrently.
+        
+        Args:
+            bases: Target currencies whose rate tables to prefetch (see rate_base())
+            dates: Dates to prefetch (mapped to the API effective dates)
+            max_workers: Maximum number of concurrent API requests
+            
+        Returns:
+            Number of rate tables fetched from the API
+        """
+        missing = self._plan_prefetch(bases, dates)
+        if not missing:
+            return 0
+        
+        logger.info(f"Prefetching {len(missing)} rate tables")
+        
+        def fetch(item: Tuple[str, date]) -> Optional[Tuple[str, date, Dict[str, float]]]:
+            base, day = item
+            try:
+                return base, day, self.client.get_exchange_rates(base, day)
+            except ValueError as e:
+                logger.error(f"Error prefetching rates for {base} on {day}: {e}")
+                return None
+        
+        with ThreadPoolExecutor(max_workers=max_workers or settings.RATE_PREFETCH_WORKERS) as executor:
+            fetched = [item for item in executor.map(fetch, missing) if item]
+        self._store_prefetched(fetched)
+        return len(fetched)
+
+    async def aprefetch_dates(self, bases: Iterable[Union[Currency, str]], dates: Iterable[date],
+                              max_workers: Optional[int] = None) -> int:
+        """
+        Async variant of prefetch_dates() built on the pooled async client.
+        
+        Args:
+            bases: Target currencies whose rate tables to prefetch (see rate_base())
+            dates: Dates to prefetch (mapped to the API effective dates)
+            max_workers: Maximum number of concurrent API requests
+            
+        Returns:
+            Number of rate tables fetched from the API
+        """
+        missing = await asyncio.to_thread(self._plan_prefetch, bases, dates)
+        if not missing:
+            return 0
+        
+        logger.info(f"Prefetching {len(missing)} rate tables")
+        semaphore = asyncio.Semaphore(max_workers or settings.RATE_PREFETCH_WORKERS)
+        
+        async def fetch(base: str, day: date) -> Optional[Tuple[str, date, Dict[str, float]]]:
+            async with semaphore:
+                try:
+                    return base, day, await self.async_client.get_exchange_rates(base, day)
+                except ValueError as e:
+                    logger.error(f"Error prefetching rates for {base} on {day}: {e}")
+                    return None
+        
+        results = await asyncio.gather(*(fetch(base, day) for base, day in missing))
+        fetched = [item for item in results if item]
+        await asyncio.to_thread(self._store_prefetched, fetched)
+        return len(fetched)
+
+    def prefetch_rates(self, bases: Iterable[Union[Currency, str]], date_from: date, date_to: date,
+                       max_workers: Optional[int] = None) -> int:
+        """
+        Prefetch rate tables for every base currency and every day of a date range.
+        
+        Args:
+            bases: Target currencies whose rate tables to prefetch (see rate_base())
+            date_from: First date of the range (inclusive)
+            date_to: Last date of the range (inclusive)
+            max_workers: Maximum number of concurrent API requests
+            
+        Returns:
+            Number of rate tables fetched from the API
+        """
+        return self.prefetch_dates(bases, date_range(date_from, date_to), max_workers)
+
+    async def aprefetch_rates(self, bases: Iterable[Union[Currency, str]], date_from: date, date_to: date,
+                              max_workers: Optional[int] = None) -> int:
+        """
+        Async variant of prefetch_rates().
+        
+        Args:
+            bases: Target currencies whose rate tables to prefetch (see rate_base())
+            date_from: First date of the range (inclusive)
+            date_to: Last date of the range (inclusive)
+            max_workers: Maximum number of concurrent API requests
+            
+        Returns:
+            Number of rate tables fetched from the API
+        """
+        return await self.aprefetch_dates(bases, date_range(date_from, date_to), max_workers)
+    
     def get_rate(self, from_currency: Union[Currency, str], to_currency: Union[Currency, str], 
                  request_date: Optional[date] = None) -> float:
         """
@@ -91,14 +296,91 @@ class CurrencyConverter:
         if from_currency == to_currency:
             return 1.0
         
-        # Get rates with from_currency as base
-        rates = self.get_exchange_rates(base_currency=to_currency, request_date=request_date)
+        rates = self.get_exchange_rates(base_currency=self.rate_base(to_currency), request_date=request_date)
+        return self._table_rate(rates, from_currency, to_currency)
+    
+    def _table_rate(self, rates: Dict[str, float], from_currency: str, to_currency: str) -> float:
+        """Rate from_currency -> to_currency from the rate table of rate_base(to_currency)."""
+        if self.triangulate:
+            # Кросс-курс через опорную валюту: (from за 1 pivot) / (to за 1 pivot)
+            return self._pivot_rate(rates, from_currency) / self._pivot_rate(rates, to_currency)
         
         if from_currency not in rates:
             raise ValueError(f"Currency {from_currency} not found in exchange rates")
         
         return rates[from_currency]
     
+    async def aget_rates(self, pairs: Iterable[Tuple[str, Optional[date]]], to_currency: Union[Currency, str],
+                         max_workers: Optional[int] = None) -> Dict[Tuple[str, Optional[date]], Optional[float]]:
+        """
+        Resolve rates of (from_currency, date) pairs into to_currency without blocking the event loop.
+        
+        Every rate table is requested once (memory, SQLite, then the pooled
+        async client); a table that cannot be fetched is not requested again
+        for the other pairs of the same date.
+        
+        Args:
+            pairs: (source currency code, request date) pairs
+            to_currency: Target currency
+            max_workers: Maximum number of concurrent API requests
+            
+        Returns:
+            Dictionary {(from_currency, date): rate}, None for pairs whose rate cannot be resolved
+        """
+        if isinstance(to_currency, Currency):
+            to_currency = to_currency.value
+        to_currency = to_currency.lower()
+        base = self.rate_base(to_currency)
+        pairs = set(pairs)
+        days = {self.client.effective_date(day) for _, day in pairs}
+        if days:
+            await asyncio.to_thread(self.warm_rates, base, min(days), max(days))
+        semaphore = asyncio.Semaphore(max_workers or settings.RATE_PREFETCH_WORKERS)
+        
+        async def fetch(day: date) -> Tuple[date, Optional[Dict[str, float]]]:
+            async with semaphore:
+                try:
+                    return day, await self.aget_exchange_rates(base, day)
+                except ValueError as e:
+                    logger.error(f"Error getting rates for {base} on {day}: {e}")
+                    return day, None
+        
+        tables = dict(await asyncio.gather(*(fetch(day) for day in days)))
+        rates: Dict[Tuple[str, Optional[date]], Optional[float]] = {}
+        for from_currency, day in pairs:
+            table = tables[self.client.effective_date(day)]
+            try:
+                rates[(from_currency, day)] = self._table_rate(table, from_currency.lower(), to_currency) if table else None
+            except ValueError as e:
+                logger.error(f"Currency conversion error: {e}")
+                rates[(from_currency, day)] = None
+        return rates
+    
+    def _pivot_rate(self, rates: Dict[str, float], currency: str) -> float:
+        """Units of currency per one unit of the pivot currency."""
+        if currency == self.pivot:
+            return 1.0
+        rate = rates.get(currency)
+        if not rate:
+            raise ValueError(f"Currency {currency} not found in exchange rates")
+        return rate
+    
+    def rate_base(self, to_currency: Union[Currency, str]) -> str:
+        """
+        Get the base currency whose rate table is needed to convert into to_currency.
+        
+        Args:
+            to_currency: Target currency code
+            
+        Returns:
+            Pivot currency in triangulation mode, otherwise the target currency itself
+        """
+        if self.triangulate:
+            return self.pivot
+        if isinstance(to_currency, Currency):
+            to_currency = to_currency.value
+        return to_currency.lower()
+    
     def convert(self, amount: Union[float, int], from_currency: Union[Currency, str], 
                 to_currency: Union[Currency, str], request_date: Optional[date] = None) -> float:
         """
@@ -193,3 +475,67 @@ class CurrencyConverter:
                     rate=1.0
                 )
             raise
+
+    def convert_batch(self, amounts: Iterable[Union[float, int]], from_currencies: Iterable[str],
+                      to_currency: Union[Currency, str],
+                      request_dates: Optional[Iterable[date]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Convert whole columns of amounts at once.
+
+        Each distinct (currency, date) pair is resolved exactly once through
+        get_rate(), the rates are then broadcast back to the rows and applied
+        with NumPy. Rows whose rate cannot be resolved (unknown currency,
+        missing date, API error) keep their original amount.
+
+        Args:
+            amounts: Amounts to convert
+            from_currencies: Source currency code of every amount
+            to_currency: Target currency
+            request_dates: Date of every amount (optional, latest rates if None)
+
+        Returns:
+            Tuple of (converted amounts, boolean mask of rows that were converted)
+        """
+        if isinstance(to_currency, Currency):
+            to_currency = to_currency.value
+        to_currency = to_currency.upper()
+
+        values = np.asarray(amounts, dtype=float)
+        currencies = pd.Series(from_currencies, copy=False).astype(str).str.upper().to_numpy()
+        if request_dates is None:
+            dates = pd.Series(pd.NaT, index=range(len(values)), dtype="datetime64[ns]")
+        else:
+            dates = pd.to_datetime(pd.Series(request_dates, copy=False), errors="coerce").dt.normalize()
+
+        # Уникальные пары (валюта, дата) резолвим один раз
+        currency_codes, currency_uniques = pd.factorize(currencies)
+        date_codes, date_uniques = pd.factorize(dates)  # NaT -> -1
+        pair_keys = currency_codes.astype(np.int64) * (len(date_uniques) + 1) + (date_codes + 1)
+        codes, unique_keys = pd.factorize(pair_keys)
+
+        # Загружаем недостающие курсы заранее, чтобы цикл ниже не ходил в сеть
+        self.prefetch_dates([to_currency], [d.date() for d in date_uniques])
+
+        unique_rates = np.full(len(unique_keys), np.nan)
+        for i, key in enumerate(unique_keys):
+            currency = currency_uniques[key // (len(date_uniques) + 1)]
+            date_idx = key % (len(date_uniques) + 1) - 1
+            day = date_uniques[date_idx].date() if date_idx >= 0 else None
+            if currency == to_currency:
+                unique_rates[i] = 1.0
+                continue
+            if request_dates is not None and day is None:
+                logger.error(f"Currency conversion error: missing date for {currency}")
+                continue
+            try:
+                unique_rates[i] = self.get_rate(Currency(currency), to_currency, day)
+            except Exception as e:
+                logger.error(f"Currency conversion error for {currency} on {day or 'latest'}: {e}")
+
+        rates = unique_rates[codes]
+        converted_mask = ~np.isnan(rates) & (rates != 0)
+        converted = values.copy()
+        converted[converted_mask] = np.round(values[converted_mask] / rates[converted_mask], 2)
+        logger.info(f"Batch converted {int(converted_mask.sum())}/{len(values)} amounts to {to_currency} "
+                    f"using {len(unique_keys)} distinct rates")
+        return converted, converted_mask
@@ -0,0 +1,147 @@
+"""
+In-process memory cache for currency exchange rates.
+Кэш курсов валют в памяти процесса.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RateMemoryCache:
+    """
+    Bounded LRU cache with TTL for exchange rate tables.
+
+    Sits in front of CurrencyCache (SQLite) and is keyed by
+    (base_currency, effective date) so that repeated lookups of the same
+    table within a request never touch SQLite or re-parse JSON.
+
+    Reads of fresh entries take no lock; writes, evictions and removal of
+    expired entries do. The hit/miss counters are updated without the lock
+    and are approximate under concurrent access.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl_seconds: float = 3600):
+        """
+        Initialize the memory cache.
+
+        Args:
+            max_entries: Maximum number of rate tables to keep
+            ttl_seconds: Time to live of an entry in seconds (0 disables expiration)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(base_currency: str, request_date: Optional[date]) -> Tuple[str, str]:
+        return base_currency.lower(), request_date.isoformat() if request_date else "latest"
+
+    def get(self, base_currency: str, request_date: Optional[date]) -> Optional[Dict[str, float]]:
+        """
+        Get a rate table from memory.
+
+        Args:
+            base_currency: Base currency code (e.g., 'usd', 'eur')
+            request_date: Effective date of the rate table
+
+        Returns:
+            Dictionary with currency codes as keys and exchange rates as values,
+            or None if the entry is missing or expired
+        """
+        key = self._key(base_currency, request_date)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        stored_at, rates = entry
+        if self.ttl_seconds and time.monotonic() - stored_at > self.ttl_seconds:
+            self.misses += 1
+            with self._lock:
+                # Удаляем, только если запись не обновили параллельно
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            return None
+        try:
+            self._entries.move_to_end(key)
+        except KeyError:
+            # Запись вытеснена параллельной вставкой
+            pass
+        self.hits += 1
+        return rates
+
+    def contains(self, base_currency: str, request_date: Optional[date]) -> bool:
+        """
+        Check for a fresh entry without touching hit/miss counters or LRU order.
+
+        Args:
+            base_currency: Base currency code (e.g., 'usd', 'eur')
+            request_date: Effective date of the rate table
+
+        Returns:
+            True if the rate table is in memory and not expired
+        """
+        entry = self._entries.get(self._key(base_currency, request_date))
+        if entry is None:
+            return False
+        return not self.ttl_seconds or time.monotonic() - entry[0] <= self.ttl_seconds
+
+    def put(self, base_currency: str, request_date: Optional[date], rates: Dict[str, float]):
+        """
+        Store a rate table in memory, evicting the least recently used entries.
+
+        Args:
+            base_currency: Base currency code (e.g., 'usd', 'eur')
+            request_date: Effective date of the rate table
+            rates: Dictionary with currency codes as keys and exchange rates as values
+        """
+        key = self._key(base_currency, request_date)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), rates)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all entries and reset counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with size, capacity, hits, misses, evictions and hit ratio
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# Общий для всех CurrencyConverter экземпляр
+rate_memory_cache = RateMemoryCache(
+    max_entries=settings.RATE_MEMORY_CACHE_SIZE,
+    ttl_seconds=settings.RATE_MEMORY_CACHE_TTL
+)
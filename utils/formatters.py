@@ -1,37 +1,295 @@
-from typing import List
-from pydantic import BaseModel
-from fastapi.responses import StreamingResponse
-import pandas as pd
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Type, Union
+from enum import Enum
+from functools import lru_cache
+from pydantic import BaseModel, TypeAdapter
+from fastapi.responses import Response, StreamingResponse
+import csv
 import io
 
 from models.format_enum import FormatEnum
+from models.payment_model import PaymentBatch
+
+# Результат сервиса: список/итератор моделей или column-oriented PaymentBatch
+ResultData = Union[Iterable[BaseModel], PaymentBatch]
+
+
+# Сколько строк CSV накапливать перед отправкой очередной части ответа
+CSV_FLUSH_ROWS = 1000
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
 
 
 def format_data_response(
-    data: List[BaseModel],
+    data: ResultData,
     fmt: FormatEnum,
     filename: str
 ):
     """
     Форматирует результат в JSON или CSV.
-    - fmt == FormatEnum.json: возвращает list модели (FastAPI сериализует в JSON).
-    - fmt == FormatEnum.csv: возвращает StreamingResponse с CSV-данными.
+    - fmt == FormatEnum.json: возвращает Response с JSON, сериализованным одним вызовом
+      TypeAdapter (без повторной валидации через response_model; схема OpenAPI не меняется).
+    - fmt == FormatEnum.ndjson: возвращает Response с одним JSON-объектом на строку.
+    - fmt == FormatEnum.csv: возвращает StreamingResponse, который пишет CSV построчно
+      по мере получения моделей из data.
+
+    Args:
+        data: Список или итератор Pydantic-моделей, либо PaymentBatch
+        fmt: Формат (json, ndjson или csv)
+        filename: Имя файла для CSV
+
+    Returns:
+        JSON/NDJSON Response или CSV StreamingResponse
+    """
+    if fmt == FormatEnum.json:
+        return Response(content=dump_json(data), media_type="application/json")
+    if fmt == FormatEnum.ndjson:
+        return Response(content=dump_ndjson(data), media_type=NDJSON_MEDIA_TYPE)
+    return StreamingResponse(
+        iter_csv_rows(data),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+_records_adapter = TypeAdapter(List[Dict[str, Any]])
+
+
+def dump_json(data: ResultData) -> bytes:
+    """
+    Сериализует список моделей в JSON-массив одним вызовом pydantic-core.
+
+    Args:
+        data: Список или итератор Pydantic-моделей одного типа, либо PaymentBatch
+
+    Returns:
+        JSON в кодировке utf-8
+    """
+    if isinstance(data, PaymentBatch):
+        return _records_adapter.dump_json(data.to_records())
+    items = data if isinstance(data, list) else list(data)
+    if not items:
+        return b"[]"
+    return _list_adapter(type(items[0])).dump_json(items)
+
+
+@lru_cache(maxsize=None)
+def _item_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+_record_adapter = TypeAdapter(Dict[str, Any])
+
+
+def dump_ndjson(data: ResultData) -> bytes:
+    """
+    Сериализует модели в NDJSON: один JSON-объект на строку.
+
+    Args:
+        data: Список или итератор Pydantic-моделей одного типа, либо PaymentBatch
+
+    Returns:
+        NDJSON в кодировке utf-8
+    """
+    if isinstance(data, PaymentBatch):
+        return b"".join(_record_adapter.dump_json(record) + b"\n" for record in data.to_records())
+    items = data if isinstance(data, list) else list(data)
+    if not items:
+        return b""
+    adapter = _item_adapter(type(items[0]))
+    return b"".join(adapter.dump_json(item) + b"\n" for item in items)
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def iter_csv_rows(items: Union[ResultData, Iterable[PaymentBatch]],
+                  flush_rows: int = CSV_FLUSH_ROWS) -> Iterator[bytes]:
+    """
+    Пишет модели в CSV построчно и отдает закодированные части по flush_rows строк.
+    Заголовок берется из полей первой модели (или PaymentBatch.fields).
+
+    Args:
+        items: Итератор Pydantic-моделей, PaymentBatch или итератор PaymentBatch
+        flush_rows: Число строк в одной части
+
+    Yields:
+        Части CSV в кодировке utf-8
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    fields = None
+    rows = 0
+    for values in _iter_csv_values(items):
+        if fields is None:
+            fields = values
+            writer.writerow(fields)
+            continue
+        writer.writerow(values)
+        rows += 1
+        if rows % flush_rows == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _iter_csv_values(items: Union[ResultData, Iterable[PaymentBatch]]) -> Iterator[List[Any]]:
+    """Заголовок, затем значения каждой строки."""
+    header_sent = False
+    batches = [items] if isinstance(items, PaymentBatch) else items
+    for item in batches:
+        if isinstance(item, PaymentBatch):
+            if not header_sent:
+                yield list(item.fields)
+                header_sent = True
+            for row in item.rows():
+                yield [_csv_value(value) for value in row]
+        else:
+            fields = type(item).model_fields
+            if not header_sent:
+                yield list(fields)
+                header_sent = True
+            yield [_csv_value(getattr(item, field)) for field in fields]
+
+
+def iter_chunked_body(chunks: Iterable[ResultData], fmt: FormatEnum) -> Iterator[bytes]:
+    """
+    Сериализует результат, обработанный частями, в JSON-массив, NDJSON или CSV.
+    Части обрабатываются лениво, по мере потребления тела ответа.
 
     Args:
-        data: Список Pydantic-моделей
-        fmt: Формат (json или csv)
+        chunks: Итератор частей (списков Pydantic-моделей или PaymentBatch)
+        fmt: Формат (json, ndjson или csv)
+
+    Returns:
+        Итератор частей тела ответа
+    """
+    if fmt == FormatEnum.json:
+        return _iter_json_chunks(chunks)
+    if fmt == FormatEnum.ndjson:
+        return (dump_ndjson(chunk) for chunk in chunks)
+    return iter_csv_rows(_flatten_chunks(chunks))
+
+
+def format_chunked_response(
+    body: Union[Iterable[bytes], AsyncIterable[bytes]],
+    fmt: FormatEnum,
+    filename: str
+) -> StreamingResponse:
+    """
+    Стримит результат, обработанный частями, в JSON или CSV.
+    Каждая часть сериализуется и отправляется сразу, в памяти держится только одна часть.
+
+    Args:
+        body: Тело ответа из iter_chunked_body (синхронное выполняется в threadpool Starlette,
+              асинхронное — например, WorkerPool.iterate со слотом пула)
+        fmt: Формат (json, ndjson или csv)
         filename: Имя файла для CSV
 
     Returns:
-        JSON или CSV StreamingResponse
+        StreamingResponse с JSON-массивом, NDJSON или CSV-данными
     """
     if fmt == FormatEnum.json:
-        return data
-    # CSV
-    df = pd.DataFrame([item.model_dump() for item in data])
-    csv_str = df.to_csv(index=False)
+        return StreamingResponse(body, media_type="application/json")
+    if fmt == FormatEnum.ndjson:
+        return StreamingResponse(body, media_type=NDJSON_MEDIA_TYPE)
     return StreamingResponse(
-        io.StringIO(csv_str),
+        body,
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
+
+
+def _flatten_chunks(chunks: Iterable[ResultData]) -> Iterator[Union[BaseModel, PaymentBatch]]:
+    for chunk in chunks:
+        if isinstance(chunk, PaymentBatch):
+            yield chunk
+        else:
+            yield from chunk
+
+
+def _iter_json_chunks(chunks: Iterable[ResultData]) -> Iterator[bytes]:
+    yield b"["
+    first = True
+    for chunk in chunks:
+        if not len(chunk):
+            continue
+        # Массив части без скобок: [a,b] -> a,b
+        yield (b"" if first else b",") + dump_json(chunk)[1:-1]
+        first = False
+    yield b"]"
+
+
+def format_stream_response(
+    chunks: AsyncIterable[List[BaseModel]],
+    fmt: FormatEnum,
+    filename: str
+) -> StreamingResponse:
+    """
+    Стримит результат, который асинхронно читается частями (например, с серверного курсора БД).
+    Каждая часть сериализуется и отправляется сразу, в памяти держится только одна часть.
+
+    Args:
+        chunks: Асинхронный итератор списков Pydantic-моделей
+        fmt: Формат (json, ndjson или csv)
+        filename: Имя файла для CSV
+
+    Returns:
+        StreamingResponse с JSON-массивом, NDJSON или CSV-данными
+    """
+    if fmt == FormatEnum.json:
+        return StreamingResponse(_aiter_json_chunks(chunks), media_type="application/json")
+    if fmt == FormatEnum.ndjson:
+        return StreamingResponse(_aiter_ndjson_chunks(chunks), media_type=NDJSON_MEDIA_TYPE)
+    return StreamingResponse(
+        _aiter_csv_chunks(chunks),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+async def _aiter_json_chunks(chunks: AsyncIterable[List[BaseModel]]) -> AsyncIterator[bytes]:
+    yield b"["
+    first = True
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        yield (b"" if first else b",") + dump_json(chunk)[1:-1]
+        first = False
+    yield b"]"
+
+
+async def _aiter_ndjson_chunks(chunks: AsyncIterable[List[BaseModel]]) -> AsyncIterator[bytes]:
+    async for chunk in chunks:
+        if chunk:
+            yield dump_ndjson(chunk)
+
+
+async def _aiter_csv_chunks(chunks: AsyncIterable[List[BaseModel]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    header_sent = False
+    async for chunk in chunks:
+        values = _iter_csv_values(chunk)
+        header = next(values, None)
+        if header is None:
+            continue
+        # Заголовок только в первой части
+        if not header_sent:
+            writer.writerow(header)
+            header_sent = True
+        writer.writerows(values)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
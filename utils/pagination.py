@@ -0,0 +1,129 @@
+"""
+Keyset (cursor) pagination helpers.
+Постраничная выдача по ключу (курсору).
+"""
+
+import json
+import base64
+import hashlib
+import binascii
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+
+# Заголовок ответа с курсором следующей страницы (отсутствует на последней странице)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def filters_fingerprint(filters: Dict[str, Any]) -> str:
+    """Short digest of the request filters a cursor belongs to."""
+    raw = json.dumps(filters, sort_keys=True, default=str, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:12]
+
+
+def encode_cursor(key: Sequence[Any], filters: Dict[str, Any]) -> str:
+    """Encode a page key and the request filters into an opaque URL-safe cursor."""
+    raw = json.dumps([*key, filters_fingerprint(filters)], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Tuple[Any, ...], filters: Dict[str, Any]) -> Tuple[Any, ...]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor: Opaque cursor from the X-Next-Cursor header
+        types: Expected type (or tuple of types) of every key part
+        filters: Filters of the current request
+
+    Returns:
+        Page key tuple
+
+    Raises:
+        ValueError: If the cursor is malformed, does not match the key types
+                    or was issued for different filters
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if (not isinstance(key, list) or len(key) != len(types) + 1
+            or not all(isinstance(v, t) and not isinstance(v, bool) for v, t in zip(key, types))):
+        raise ValueError("Invalid cursor")
+    # Курсор действует только для тех же фильтров и валюты: иначе ключ указывал бы в другую выборку
+    if key[-1] != filters_fingerprint(filters):
+        raise ValueError("Cursor does not match the request filters")
+    return tuple(key[:-1])
+
+
+def page_after(limit: Optional[int], cursor: Optional[str], stream: bool,
+               types: Tuple[Any, ...], filters: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    """
+    Validate pagination query parameters and decode the cursor.
+
+    Args:
+        limit: Page size (None — no pagination)
+        cursor: Cursor of the next page
+        stream: Whether a streamed response was requested
+        types: Expected type (or tuple of types) of every key part
+        filters: Filters of the current request the cursor must have been issued for
+
+    Returns:
+        Key of the last row of the previous page, or None for the first page
+
+    Raises:
+        HTTPException: 400 if the parameters are inconsistent or the cursor is invalid
+    """
+    if limit is None:
+        if cursor:
+            raise HTTPException(status_code=400, detail="cursor requires limit")
+        return None
+    if stream:
+        raise HTTPException(status_code=400, detail="limit cannot be combined with stream")
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor, types, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def page_by_date(rows: List[Any], limit: int, after: Optional[Tuple[str, int]],
+                 filters: Dict[str, Any]) -> Tuple[List[Any], Optional[str]]:
+    """
+    Take one page of report rows ordered by (date, ordinal within the date).
+
+    The ordinal is the position of a row among the rows of the same date in
+    the result, so the key is unique even when a report has several rows
+    per day.
+
+    Args:
+        rows: Report rows with a `date` attribute (not modified)
+        limit: Page size
+        after: Key of the last row of the previous page (first page if None)
+        filters: Filters of the request, bound to the next page cursor
+
+    Returns:
+        Tuple of (page rows, cursor of the next page or None on the last page)
+    """
+    ordered = sorted(rows, key=lambda row: row.date)
+    counts: Dict[Any, int] = {}
+    keys = []
+    for row in ordered:
+        ordinal = counts.get(row.date, 0)
+        counts[row.date] = ordinal + 1
+        keys.append((row.date.isoformat(), ordinal))
+
+    start = bisect_right(keys, after) if after is not None else 0
+    end = start + limit
+    next_cursor = encode_cursor(keys[end - 1], filters) if end < len(ordered) else None
+    return ordered[start:end], next_cursor
+
+
+def with_next_cursor(response: Response, next_cursor: Optional[str]) -> Response:
+    """Set the X-Next-Cursor header of a response when there is a next page."""
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
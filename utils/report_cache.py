@@ -0,0 +1,191 @@
+"""
+In-process result cache for report queries.
+Кэш результатов SQL-отчетов в памяти процесса.
+"""
+
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def parse_ttls(value: str) -> Dict[str, float]:
+    """Parse per-query TTLs from 'query_name=seconds,...'."""
+    ttls = {}
+    for item in value.split(","):
+        name, _, seconds = item.partition("=")
+        if name.strip() and seconds.strip():
+            ttls[name.strip()] = float(seconds)
+    return ttls
+
+
+class ReportCache:
+    """
+    Bounded LRU cache of report results with per-query TTL and stale-while-revalidate.
+
+    Keys start with (kind, query_name, ...). A fresh entry is returned as is.
+    An expired entry that is still within the stale window is returned
+    immediately while one background task recomputes it. Concurrent misses
+    for the same key share a single computation. Failed computations are
+    never cached.
+    """
+
+    def __init__(self, max_entries: int = 256, default_ttl: float = 60,
+                 stale_ttl: float = 300, ttls: Optional[Dict[str, float]] = None):
+        """
+        Initialize the report cache.
+
+        Args:
+            max_entries: Maximum number of cached results
+            default_ttl: Time in seconds a result is fresh (0 disables caching)
+            stale_ttl: Time in seconds after expiration a result may still be served while refreshing
+            ttls: Per-query TTL overrides {query_name: seconds}
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.ttls = ttls or {}
+        self._entries: "OrderedDict[Tuple, Tuple[float, float, List[Any]]]" = OrderedDict()
+        # Расчеты в процессе: {key: (generation, task)}
+        self._in_flight: Dict[Tuple, Tuple[int, asyncio.Future]] = {}
+        self._generation = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def ttl(self, query_name: str) -> float:
+        """TTL in seconds for a query."""
+        return self.ttls.get(query_name, self.default_ttl)
+
+    async def get_or_compute(self, key: Tuple[Hashable, ...],
+                             compute: Callable[[], Awaitable[List[Any]]]) -> List[Any]:
+        """
+        Get a cached result or compute it.
+
+        Args:
+            key: Cache key (kind, query_name, parameters...)
+            compute: Coroutine function computing the result
+
+        Returns:
+            Report rows (shared between requests, do not modify)
+        """
+        ttl = self.ttl(key[1])
+        if ttl <= 0:
+            return await compute()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, entry_ttl, result = entry
+            age = time.monotonic() - stored_at
+            if age <= entry_ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            if age <= entry_ttl + self.stale_ttl:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                if key not in self._in_flight:
+                    self._start(key, compute, ttl)
+                return result
+
+        self.misses += 1
+        in_flight = self._in_flight.get(key)
+        task = in_flight[1] if in_flight else self._start(key, compute, ttl)
+        # shield: отмена одного из ожидающих не отменяет общий расчет
+        return await asyncio.shield(task)
+
+    def _start(self, key: Tuple, compute: Callable[[], Awaitable[List[Any]]], ttl: float) -> asyncio.Future:
+        self._generation += 1
+        generation = self._generation
+        task = asyncio.ensure_future(self._compute(key, compute, ttl, generation))
+        self._in_flight[key] = (generation, task)
+        task.add_done_callback(lambda t: self._finish(key, generation, t))
+        return task
+
+    def _finish(self, key: Tuple, generation: int, task: asyncio.Future):
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None and in_flight[0] == generation:
+            del self._in_flight[key]
+        # Ошибка уже залогирована в _compute; фоновое обновление никто не ждет,
+        # поэтому исключение забирается здесь ("Task exception was never retrieved")
+        if not task.cancelled():
+            task.exception()
+
+    async def _compute(self, key: Tuple, compute: Callable[[], Awaitable[List[Any]]], ttl: float,
+                       generation: int) -> List[Any]:
+        try:
+            result = await compute()
+        except Exception as e:
+            logger.error(f"Error computing report {key[:2]}: {e}")
+            raise
+        in_flight = self._in_flight.get(key)
+        if in_flight is None or in_flight[0] != generation:
+            # Кэш сброшен во время расчета: результат отдается ожидающим, но не сохраняется
+            logger.info(f"Discarded report {key[:2]} computed before invalidation")
+            return result
+        self._entries[key] = (time.monotonic(), ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return result
+
+    def invalidate(self, kind: Optional[str] = None, query_name: Optional[str] = None) -> int:
+        """
+        Drop cached results.
+
+        Computations already in progress for the matching keys are detached:
+        their results are not stored, and new requests start a fresh computation.
+
+        Args:
+            kind: Drop only results of this report kind (all kinds if None)
+            query_name: Drop only results of this query (all queries if None)
+
+        Returns:
+            Number of dropped entries
+        """
+        keys = [
+            k for k in self._entries
+            if (kind is None or k[0] == kind) and (query_name is None or k[1] == query_name)
+        ]
+        for key in keys:
+            del self._entries[key]
+        for key in [
+            k for k in self._in_flight
+            if (kind is None or k[0] == kind) and (query_name is None or k[1] == query_name)
+        ]:
+            del self._in_flight[key]
+        logger.info(f"Invalidated {len(keys)} cached reports (kind={kind}, query_name={query_name})")
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with size, capacity, TTLs, hits, stale hits and misses
+        """
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "default_ttl": self.default_ttl,
+            "stale_ttl": self.stale_ttl,
+            "ttls": self.ttls,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshing": len(self._in_flight),
+        }
+
+
+# Общий кэш отчетов процесса
+report_cache = ReportCache(
+    max_entries=settings.REPORT_CACHE_SIZE,
+    default_ttl=settings.REPORT_CACHE_TTL,
+    stale_ttl=settings.REPORT_CACHE_STALE_TTL,
+    ttls=parse_ttls(settings.REPORT_CACHE_TTLS)
+)
@@ -0,0 +1,250 @@
+"""
+SQLite store of per-day report results for incremental report computation.
+SQLite хранилище результатов отчетов по дням для инкрементального расчета.
+"""
+
+import os
+import json
+import asyncio
+import sqlite3
+import logging
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from core.config import settings
+from utils.sql_registry import SQLScript
+from utils.sqlite_connections import local_connections
+
+logger = logging.getLogger(__name__)
+
+# Функция выполнения отчета за диапазон дат: (date_from, date_to) -> строки с полем "date"
+FetchRange = Callable[[date, date], Awaitable[List[Dict[str, Any]]]]
+
+
+def _day(value: Any) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def missing_ranges(days: List[date]) -> Iterator[Tuple[date, date]]:
+    """Group sorted days into contiguous (first, last) ranges."""
+    start = prev = None
+    for day in days:
+        if start is None:
+            start = prev = day
+        elif day == prev + timedelta(days=1):
+            prev = day
+        else:
+            yield start, prev
+            start = prev = day
+    if start is not None:
+        yield start, prev
+
+
+class ReportStore:
+    """
+    Per-day materialized report rows.
+
+    Each (namespace, query_name, day) holds the rows the query returned for
+    that day, including days without rows, tagged with the checksum of the
+    SQL script that produced them. Only days that are missing, were computed
+    by another script version, or are recent enough to still change are
+    queried again.
+    """
+
+    def __init__(self, db_path: str = "data/report_store.db", mutable_days: int = 2):
+        """
+        Initialize the report store.
+
+        Args:
+            db_path: Path to the SQLite database file
+            mutable_days: Number of most recent days (up to today) that are always recomputed
+        """
+        self.db_path = db_path
+        self.mutable_days = mutable_days
+        self._connections = local_connections(db_path)
+        self._init_db()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Получить соединение текущего потока"""
+        return self._connections.get()
+
+    def _init_db(self):
+        """Initialize the database for per-day report rows."""
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        try:
+            conn = self._get_connection()
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS report_days (
+                    namespace TEXT NOT NULL,
+                    query_name TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    rows TEXT NOT NULL,
+                    query_version TEXT NOT NULL,
+                    computed_at TEXT NOT NULL,
+                    PRIMARY KEY (namespace, query_name, day)
+                ) WITHOUT ROWID
+            ''')
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Error initializing report store: {e}")
+            self._connections.close()
+
+    def mutable_from(self) -> date:
+        """First day that is still considered mutable."""
+        return date.today() - timedelta(days=max(self.mutable_days - 1, 0))
+
+    def get_days(self, namespace: str, script: SQLScript, date_from: date,
+                 date_to: date) -> Dict[date, List[Dict[str, Any]]]:
+        """
+        Get stored rows of a query for a date range, computed by the current script version.
+
+        Args:
+            namespace: Report kind (e.g., 'financial', 'activity')
+            script: SQL script of the query
+            date_from: First day of the range (inclusive)
+            date_to: Last day of the range (inclusive)
+
+        Returns:
+            Dictionary {day: rows} for the stored days only
+        """
+        conn = self._get_connection()
+        cursor = conn.execute(
+            """
+            SELECT day, rows FROM report_days
+            WHERE namespace = ? AND query_name = ? AND day BETWEEN ? AND ? AND query_version = ?
+            """,
+            (namespace, script.name, date_from.isoformat(), date_to.isoformat(), script.checksum)
+        )
+        result = {}
+        for day_str, rows in cursor:
+            day = date.fromisoformat(day_str)
+            result[day] = [dict(row, date=day) for row in json.loads(rows)]
+        return result
+
+    def put_days(self, namespace: str, script: SQLScript, days: Dict[date, List[Dict[str, Any]]]):
+        """
+        Store rows of a query per day in a single transaction.
+
+        Args:
+            namespace: Report kind (e.g., 'financial', 'activity')
+            script: SQL script of the query
+            days: Dictionary {day: rows}, days without rows map to an empty list
+        """
+        computed_at = datetime.now().isoformat()
+        items = [
+            (
+                namespace, script.name, day.isoformat(),
+                json.dumps([{k: v for k, v in row.items() if k != "date"} for row in rows], default=_json_default),
+                script.checksum, computed_at
+            )
+            for day, rows in days.items()
+        ]
+        conn = self._get_connection()
+        with conn:
+            conn.executemany(
+                """
+                INSERT INTO report_days (namespace, query_name, day, rows, query_version, computed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (namespace, query_name, day)
+                DO UPDATE SET rows = excluded.rows, query_version = excluded.query_version,
+                              computed_at = excluded.computed_at
+                """,
+                items
+            )
+
+    async def load_range(self, namespace: str, script: SQLScript, date_from: date, date_to: date,
+                         fetch: FetchRange) -> List[Dict[str, Any]]:
+        """
+        Get report rows for a date range, querying only missing and mutable days.
+
+        Args:
+            namespace: Report kind (e.g., 'financial', 'activity')
+            script: SQL script of the query
+            date_from: First day of the range (inclusive)
+            date_to: Last day of the range (inclusive)
+            fetch: Function running the query for a contiguous date range
+
+        Returns:
+            Rows of all days in the range ordered by day
+        """
+        # Запросы SQLite синхронные: выполняются в потоке, чтобы не блокировать event loop
+        try:
+            days = await asyncio.to_thread(self.get_days, namespace, script, date_from, date_to)
+        except Exception as e:
+            logger.error(f"Error reading report store: {e}")
+            days = {}
+
+        mutable_from = self.mutable_from()
+        for day in [d for d in days if d >= mutable_from]:
+            del days[day]
+        missing = [
+            date_from + timedelta(days=i)
+            for i in range((date_to - date_from).days + 1)
+            if date_from + timedelta(days=i) not in days
+        ]
+
+        for range_from, range_to in missing_ranges(missing):
+            fetched: Dict[date, List[Dict[str, Any]]] = {
+                range_from + timedelta(days=i): [] for i in range((range_to - range_from).days + 1)
+            }
+            for row in await fetch(range_from, range_to):
+                day = _day(row["date"])
+                if day in fetched:
+                    fetched[day].append(row)
+            logger.info(f"Computed '{script.name}' for {range_from}..{range_to} ({len(fetched)} days)")
+            try:
+                await asyncio.to_thread(self.put_days, namespace, script, fetched)
+            except Exception as e:
+                logger.error(f"Error writing report store: {e}")
+            days.update(fetched)
+
+        logger.info(
+            f"Report '{script.name}' {date_from}..{date_to}: "
+            f"{len(days) - len(missing)} days from store, {len(missing)} days queried"
+        )
+        return [row for day in sorted(days) for row in days[day]]
+
+    def invalidate(self, namespace: Optional[str] = None, query_name: Optional[str] = None) -> int:
+        """
+        Drop stored days.
+
+        Args:
+            namespace: Drop only days of this report kind (all kinds if None)
+            query_name: Drop only days of this query (all queries if None)
+
+        Returns:
+            Number of dropped days
+        """
+        conn = self._get_connection()
+        with conn:
+            cursor = conn.execute(
+                """
+                DELETE FROM report_days
+                WHERE (? IS NULL OR namespace = ?) AND (? IS NULL OR query_name = ?)
+                """,
+                (namespace, namespace, query_name, query_name)
+            )
+        return cursor.rowcount
+
+
+# Общее хранилище отчетов по дням
+report_store = ReportStore(
+    db_path=settings.REPORT_STORE_PATH,
+    mutable_days=settings.REPORT_MUTABLE_DAYS
+)
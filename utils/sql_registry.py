@@ -0,0 +1,169 @@
+"""
+In-memory registry of SQL report scripts.
+Реестр SQL-скриптов отчетов в памяти процесса.
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+import sqlalchemy
+from sqlalchemy.sql.elements import TextClause
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SQLScript(NamedTuple):
+    """Loaded SQL script with its compiled statement."""
+    name: str
+    path: str
+    fingerprint: tuple
+    checksum: str
+    text: str
+    statement: TextClause
+
+
+class _Directory(NamedTuple):
+    scripts: Dict[str, SQLScript]
+    checked_at: float
+
+
+class SQLRegistry:
+    """
+    Registry of SQL scripts keyed by directory and query name.
+
+    Each directory is scanned once and its scripts are kept as compiled
+    TextClause objects. Changed, added and removed files are picked up by
+    mtime at most once per check interval, so the request path does no
+    file I/O between checks. Unknown query names are rejected without
+    touching the filesystem or the database.
+    """
+
+    def __init__(self, check_interval: float = 5):
+        """
+        Initialize the registry.
+
+        Args:
+            check_interval: Minimum interval in seconds between directory re-scans (0 disables re-scans)
+        """
+        self.check_interval = check_interval
+        self._directories: Dict[str, _Directory] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def default_dirs() -> Dict[str, str]:
+        """Directories of the report services: {namespace: path}."""
+        return {
+            "financial": settings.SQL_DIR + "/financial",
+            "activity": settings.SQL_DIR + "/activity",
+        }
+
+    def load(self, sql_dir: str) -> int:
+        """
+        Scan a directory now and (re)load changed scripts.
+
+        Args:
+            sql_dir: Directory with .sql files
+
+        Returns:
+            Number of scripts in the directory
+        """
+        with self._lock:
+            return len(self._scan(sql_dir).scripts)
+
+    def _scan(self, sql_dir: str) -> _Directory:
+        key = os.path.abspath(sql_dir)
+        previous = self._directories.get(key)
+        old_scripts = previous.scripts if previous else {}
+        scripts: Dict[str, SQLScript] = {}
+        try:
+            entries = [e for e in os.scandir(key) if e.is_file() and e.name.endswith(".sql")]
+        except FileNotFoundError:
+            logger.warning(f"SQL directory not found: {sql_dir}")
+            entries = []
+
+        for entry in entries:
+            name = entry.name[:-len(".sql")]
+            stat = entry.stat()
+            fingerprint = (stat.st_mtime_ns, stat.st_size)
+            script = old_scripts.get(name)
+            if script is None or script.fingerprint != fingerprint:
+                try:
+                    script = self._read(name, entry.path, fingerprint)
+                except Exception as e:
+                    logger.error(f"Error reading SQL script {entry.path}: {e}")
+                    continue
+            scripts[name] = script
+
+        directory = _Directory(scripts, time.monotonic())
+        self._directories[key] = directory
+        return directory
+
+    @staticmethod
+    def _read(name: str, path: str, fingerprint: tuple) -> SQLScript:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        logger.info(f"Loaded SQL script: {path}")
+        return SQLScript(
+            name=name,
+            path=path,
+            fingerprint=fingerprint,
+            checksum=hashlib.sha1(text.encode("utf-8")).hexdigest(),
+            text=text,
+            statement=sqlalchemy.text(text)
+        )
+
+    def _directory(self, sql_dir: str) -> _Directory:
+        directory = self._directories.get(os.path.abspath(sql_dir))
+        if directory is not None and (
+            not self.check_interval or time.monotonic() - directory.checked_at < self.check_interval
+        ):
+            return directory
+        with self._lock:
+            directory = self._directories.get(os.path.abspath(sql_dir))
+            if directory is not None and (
+                not self.check_interval or time.monotonic() - directory.checked_at < self.check_interval
+            ):
+                return directory
+            return self._scan(sql_dir)
+
+    def get(self, sql_dir: str, query_name: str) -> SQLScript:
+        """
+        Get a loaded SQL script by name.
+
+        Args:
+            sql_dir: Directory of the script
+            query_name: Script name without the .sql extension
+
+        Returns:
+            SQLScript with the compiled statement
+
+        Raises:
+            FileNotFoundError: If there is no such script in the directory
+        """
+        script: Optional[SQLScript] = self._directory(sql_dir).scripts.get(query_name)
+        if script is None:
+            logger.warning(f"SQL script not found: {os.path.join(sql_dir, query_name)}.sql")
+            raise FileNotFoundError(f"SQL script '{query_name}.sql' not found")
+        return script
+
+    def names(self, sql_dir: str) -> List[str]:
+        """
+        List available query names in a directory.
+
+        Args:
+            sql_dir: Directory with .sql files
+
+        Returns:
+            Sorted list of script names without extension
+        """
+        return sorted(self._directory(sql_dir).scripts)
+
+
+# Общий реестр SQL-скриптов процесса
+sql_registry = SQLRegistry(check_interval=settings.SQL_REGISTRY_CHECK_INTERVAL)
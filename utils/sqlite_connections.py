@@ -0,0 +1,92 @@
+"""
+Per-thread, per-process SQLite connections.
+SQLite-соединения отдельно для каждого потока и процесса.
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class LocalConnections:
+    """
+    SQLite connections to one database file, one per thread and process.
+
+    A connection is never shared between threads, and connections inherited
+    through fork (e.g. from a gunicorn master with preload_app) are never
+    used by the child: the owning pid is checked on every access. All
+    connections use WAL, so readers in any thread or worker process do not
+    block each other or the writer.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Initialize the connection holder (connections are opened on first use).
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        # Соединения, унаследованные от родительского процесса: их нельзя ни использовать,
+        # ни закрывать в дочернем процессе, поэтому ссылки просто сохраняются
+        self._inherited = []
+        # Схема создается один раз на процесс (таблицы на диске переживают fork)
+        self.initialized = False
+
+    def get(self) -> sqlite3.Connection:
+        """Получить соединение текущего потока или открыть новое"""
+        conn = getattr(self._local, "connection", None)
+        if conn is None or self._local.pid != os.getpid():
+            if conn is not None:
+                self._inherited.append(conn)
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        """Close the connection of the current thread."""
+        conn = getattr(self._local, "connection", None)
+        if conn is not None:
+            if self._local.pid == os.getpid():
+                conn.close()
+            else:
+                self._inherited.append(conn)
+            self._local.connection = None
+
+
+_connections: Dict[str, LocalConnections] = {}
+_lock = threading.Lock()
+
+
+def local_connections(db_path: str) -> LocalConnections:
+    """
+    Get the process-wide connection holder for a database file.
+
+    Args:
+        db_path: Path to the SQLite database file
+
+    Returns:
+        LocalConnections shared by all users of the same file
+    """
+    key = os.path.abspath(db_path)
+    with _lock:
+        holder = _connections.get(key)
+        if holder is None:
+            holder = _connections[key] = LocalConnections(db_path)
+        return holder
+
+
+def close_current_thread():
+    """Close connections of the current thread to all databases (e.g. in the master before fork)."""
+    with _lock:
+        holders = list(_connections.values())
+    for holder in holders:
+        holder.close()